@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark ts_db_processing.py against a generated raw corpus in a local mongod.
+
+Generates --docs synthetic raw deeds into a scratch database (never the live
+one), then times each stage of the processor separately and end to end:
+
+  read   iterate the market-value cursor in _id order
+  parse  transform() + rejection_reasons() on the documents in memory
+  write  unordered bulk inserts of the parsed documents into an empty collection
+  total  process_documents() as the incremental/full runs call it
+
+    python benchmark_etl.py --docs 200000
+    python benchmark_etl.py --docs 50000 --profile etl.prof
+
+--profile writes cProfile stats of the end-to-end run; view them as a
+flamegraph with e.g. `snakeviz etl.prof` or `flameprof etl.prof > etl.svg`.
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import random
+import time
+
+from pymongo import InsertOne, MongoClient
+
+from benchmark_parser import make_corpus
+from ts_db_processing import DEFAULT_BATCH_SIZE, flush, process_documents, rejection_reasons, transform
+
+BENCHMARK_DB = "etl-benchmark"
+SRO_CODES = [str(code) for code in range(1501, 1541)]
+
+
+def generate_raw_corpus(collection, docs, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert docs synthetic raw deeds shaped like the scrapers' market-value documents.
+    """
+    collection.drop()
+    batch = []
+    for i, (prop_desc, nature_and_value) in enumerate(make_corpus(docs)):
+        sro_code = random.choice(SRO_CODES)
+        batch.append({
+            "district": "Rangareddy",
+            "districtCode": "15",
+            "state": "Telangana",
+            "sroName": f"SRO {sro_code}",
+            "sroCode": sro_code,
+            "docno": str(i + 1),
+            "regYear": 2025,
+            "propertyDescription": prop_desc,
+            "natureAndValue": nature_and_value,
+            "marketValue": random.randint(10 ** 5, 10 ** 8),
+            "considerationVal": random.randint(10 ** 5, 10 ** 8),
+            "dateOfRegistration": f"{random.randint(1, 28):02d}-{random.randint(1, 12):02d}-2025",
+            "creationTime": int(time.time() * 1000),
+        })
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def time_stage(name, fn, docs, results):
+    started = time.perf_counter()
+    value = fn()
+    elapsed = time.perf_counter() - started
+    results.append((name, elapsed, docs / elapsed if elapsed > 0 else 0))
+    return value
+
+
+def run_benchmark(db, docs, batch_size, profile_path=None):
+    src = db["market-value"]
+    dst = db["market-value-processed"]
+    rejected = db["market-value-rejected"]
+    results = []
+
+    raw_docs = time_stage("read", lambda: list(src.find({}).sort("_id", 1).batch_size(batch_size)), docs, results)
+
+    def parse_all():
+        new_docs = []
+        for doc in raw_docs:
+            new_doc = transform(doc)
+            rejection_reasons(new_doc)
+            new_docs.append(new_doc)
+        return new_docs
+
+    new_docs = time_stage("parse", parse_all, docs, results)
+
+    dst.drop()
+
+    def write_all():
+        for start in range(0, len(new_docs), batch_size):
+            flush(dst, [InsertOne(new_doc) for new_doc in new_docs[start:start + batch_size]])
+
+    time_stage("write", write_all, docs, results)
+
+    dst.drop()
+    rejected.drop()
+    profiler = cProfile.Profile() if profile_path else None
+
+    def end_to_end():
+        if profiler:
+            profiler.enable()
+        try:
+            return process_documents({}, upsert=False, batch_size=batch_size, src=src, dst=dst, rejected=rejected, label="benchmark")
+        finally:
+            if profiler:
+                profiler.disable()
+
+    time_stage("total (process_documents)", end_to_end, docs, results)
+
+    print(f"\n📦 {docs:,} raw deeds, batch size {batch_size}")
+    print(f"  {'stage':<28} {'seconds':>10} {'docs/sec':>12}")
+    for name, elapsed, rate in results:
+        print(f"  {name:<28} {elapsed:>10.2f} {rate:>12,.0f}")
+
+    if profiler:
+        profiler.dump_stats(profile_path)
+        print(f"\ncProfile stats written to {profile_path}, top functions by cumulative time:")
+        pstats.Stats(profile_path).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the market-value ETL stages")
+    parser.add_argument("--uri", default=os.getenv("BENCHMARK_MONGO_URI", "mongodb://localhost:27017/"), help="local mongod to benchmark against")
+    parser.add_argument("--docs", type=int, default=100000, help="synthetic raw deeds to generate")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per bulk write")
+    parser.add_argument("--reuse", action="store_true", help="reuse the corpus of a previous run instead of regenerating it")
+    parser.add_argument("--profile", metavar="PATH", help="write cProfile stats of the end-to-end run to PATH")
+    args = parser.parse_args()
+
+    random.seed(42)
+    client = MongoClient(args.uri)
+    try:
+        db = client[BENCHMARK_DB]
+        if not args.reuse or db["market-value"].estimated_document_count() == 0:
+            started = time.perf_counter()
+            generate_raw_corpus(db["market-value"], args.docs, args.batch_size)
+            print(f"Generated {args.docs:,} raw deeds in {time.perf_counter() - started:.1f}s")
+        docs = db["market-value"].estimated_document_count()
+        run_benchmark(db, docs, args.batch_size, args.profile)
+    finally:
+        client.close()
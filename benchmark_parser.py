@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark propertyDescription / natureAndValue parsing.
+
+Compares the previous per-document parsing in ts_db_processing.py (four
+separate regex searches plus string splitting, Sale Deeds only) with
+property_parser.parse_deed on a synthetic corpus shaped like raw market-value
+deeds, and reports docs/sec for both. parse_deed extracts every field and keeps
+every deed type, so it is slower per document than the baseline; this shows by
+how much.
+
+    python benchmark_parser.py --docs 200000 --repeat 3
+"""
+import argparse
+import random
+import re
+import time
+
+from property_parser import parse_deed
+
+# Regexes of the previous transform()
+W_B_SPLIT_REGEX = re.compile(r"(.*?)\s*W-B:")
+EXTENT_VALUE_REGEX = re.compile(r"EXTENT:\s*([\d\.]+)")
+EXTENT_UNIT_REGEX = re.compile(r"EXTENT:\s*[\d\.]+\s*([A-Za-z\.]+)")
+DEED_TYPE_REGEX = re.compile(r"\d{4}\s+(.+?)\s+Mkt\.Value")
+
+VILLAGES = ["MOKILA", "SHANKARPALLY", "KOKAPET", "GOPANPALLY", "NARSINGI", "TELLAPUR"]
+UNITS = ["SQ.Yds", "SQ. FT", "Acres", "Guntas"]
+DEED_TYPES = [("0101", "Sale Deed"), ("0101", "Sale Deed"), ("0101", "Sale Deed"),
+              ("0401", "Gift Settlement"), ("0501", "Mortgage Deed"), ("1401", "Development Agreement")]
+
+
+def legacy_parse(prop_desc, nature_and_value, sale_deeds_only=True):
+    """
+    The parsing previously done inline in ts_db_processing.transform().
+    """
+    w_b_match = W_B_SPLIT_REGEX.search(prop_desc)
+    if w_b_match:
+        pre_wb_text = w_b_match.group(1).strip()
+        if pre_wb_text.startswith("VILL/COL:"):
+            pre_wb_text = pre_wb_text[len("VILL/COL:"):].strip()
+        if '/' in pre_wb_text:
+            before_slash, after_slash = pre_wb_text.split('/', 1)
+            before_slash = before_slash.strip()
+            after_slash = after_slash.strip()
+            village = before_slash if before_slash else after_slash
+        else:
+            village = pre_wb_text
+    else:
+        village = prop_desc
+
+    extent_value_match = EXTENT_VALUE_REGEX.search(prop_desc)
+    extent_value = extent_value_match.group(1) if extent_value_match else None
+
+    extent_unit_match = EXTENT_UNIT_REGEX.search(prop_desc)
+    extent_unit = extent_unit_match.group(1) if extent_unit_match else None
+
+    deed_type_match = DEED_TYPE_REGEX.search(nature_and_value)
+    deed_type = deed_type_match.group(1).strip() if deed_type_match else None
+
+    if sale_deeds_only and (not deed_type or deed_type.lower() != "sale deed"):
+        return None
+
+    return {"village": village, "extent": extent_value, "extentUnit": extent_unit, "deedType": deed_type}
+
+
+def make_corpus(docs):
+    corpus = []
+    for i in range(docs):
+        village = random.choice(VILLAGES)
+        # Some descriptions have W-B glued to the village (MOKILA/MOKILAW-B:)
+        parts = [f"VILL/COL: {village}/{village}{'' if i % 7 == 0 else ' '}W-B: 0-0",
+                 f"SURVEY: {random.randint(1, 400)}/A {random.randint(1, 400)}/AA"]
+        if i % 3 == 0:
+            parts.append(f"PLOT: {random.randint(1, 500)}")
+        if i % 4 == 0:
+            parts.append(f"APARTMENT: SRIVARI MEADOWS FLAT: {random.randint(101, 1504)}")
+        parts.append(f"EXTENT: {random.randint(50, 2000)}{random.choice(UNITS)}")
+        parts.append(f"BUILT: {random.randint(500, 5000)}SQ. FT")
+        code, deed_type = random.choice(DEED_TYPES)
+        nature_and_value = f"{code} {deed_type} Mkt.Value:Rs. {random.randint(10 ** 5, 10 ** 8)} Cons.Value:Rs. {random.randint(10 ** 5, 10 ** 8)}"
+        corpus.append((" ".join(parts), nature_and_value))
+    return corpus
+
+
+def time_it(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for prop_desc, nature_and_value in corpus:
+            fn(prop_desc, nature_and_value)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark deed description parsing")
+    parser.add_argument("--docs", type=int, default=200000, help="synthetic deeds to parse")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    random.seed(42)
+    corpus = make_corpus(args.docs)
+
+    # Both parsers must agree on the fields the legacy one extracted (extentUnit
+    # only where the legacy regex did not cut it short, e.g. "SQ." for "SQ. FT")
+    for prop_desc, nature_and_value in corpus[:1000]:
+        legacy = legacy_parse(prop_desc, nature_and_value, sale_deeds_only=False)
+        parsed = parse_deed(prop_desc, nature_and_value)
+        for field in legacy:
+            if field != "extentUnit" or " " not in parsed[field]:
+                assert parsed[field] == legacy[field], (field, prop_desc, nature_and_value)
+
+    # Free text after the extent is not part of the unit (temp.html has this layout)
+    boundaries = ("VILL/COL: MOKILA/MOKILA W-B: 0-0 SURVEY: 25/A EXTENT: 200SQ.Yds Boundires: [N]: ROAD",
+                  "0101 Sale Deed Mkt.Value:Rs. 1000000 Cons.Value:Rs. 1000000")
+    legacy = legacy_parse(*boundaries)
+    parsed = parse_deed(*boundaries)
+    for field in legacy:
+        assert parsed[field] == legacy[field], (field, boundaries)
+    assert parsed["extentSqYds"] == 200.0, boundaries
+
+    legacy_time = time_it(legacy_parse, corpus, args.repeat)
+    parse_deed_time = time_it(parse_deed, corpus, args.repeat)
+
+    print(f"\n📦 {args.docs:,} synthetic deeds")
+    print(f"  {'parser':<32} {'best s':>10} {'docs/sec':>12}")
+    print(f"  {'legacy (4 regexes, Sale Deeds)':<32} {legacy_time:>10.2f} {args.docs / legacy_time:>12,.0f}")
+    print(f"  {'property_parser.parse_deed':<32} {parse_deed_time:>10.2f} {args.docs / parse_deed_time:>12,.0f}")
+    print(f"  parse_deed / legacy time: {parse_deed_time / legacy_time:.2f}x")
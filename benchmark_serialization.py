@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization and compression of API payloads.
+
+Compares the default FastAPI path (jsonable_encoder + json.dumps, what a plain
+dict return goes through) with orjson on payloads shaped like
+/market/value/summary/by-sro and the timeseries endpoints, and reports the
+bytes on the wire with gzip and brotli.
+
+    python benchmark_serialization.py --rows 5000 --repeat 20
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def make_by_sro_payload(rows):
+    regions = []
+    for i in range(rows):
+        total_area = random.uniform(100, 50000)
+        total_consideration = random.uniform(1e6, 5e9)
+        regions.append({
+            "sroCode": str(1500 + i % 120),
+            "sroName": f"SRO NAME {i % 120}",
+            "totalTransactions": random.randint(1, 5000),
+            "totalConsideration": total_consideration,
+            "totalArea": total_area,
+            "averagePricePerExtent": total_consideration / total_area,
+        })
+    return {"startDate": None, "endDate": None, "regions": regions}
+
+
+def make_timeseries_payload(rows):
+    return {
+        "timeseries_data": [
+            {
+                "date": f"{1 + i % 28:02d}-{1 + (i // 28) % 12:02d}-{2015 + i // 336}",
+                "avgPricePerExtent": random.uniform(1000, 200000),
+                "totalTransactions": random.randint(1, 3000),
+                "totalValue": random.uniform(1e6, 5e9),
+            }
+            for i in range(rows)
+        ]
+    }
+
+
+def fastapi_default(content):
+    # Same as returning a dict from an endpoint: jsonable_encoder then JSONResponse.render
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(content):
+    return orjson.dumps(content)
+
+
+def time_it(fn, content, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(content)
+        best = min(best, time.perf_counter() - start)
+    return best, body
+
+
+def report(name, content, repeat):
+    default_time, default_body = time_it(fastapi_default, content, repeat)
+    fast_time, fast_body = time_it(fast_path, content, repeat)
+    assert json.loads(default_body) == json.loads(fast_body)
+
+    print(f"\n📦 {name}")
+    print(f"  {'serializer':<28} {'best ms':>10} {'bytes':>12}")
+    print(f"  {'jsonable_encoder+json':<28} {default_time * 1000:>10.2f} {len(default_body):>12,}")
+    print(f"  {'orjson':<28} {fast_time * 1000:>10.2f} {len(fast_body):>12,}")
+    print(f"  speedup: {default_time / fast_time:.1f}x")
+
+    print(f"  {'encoding':<28} {'bytes':>12} {'ratio':>8}")
+    print(f"  {'identity':<28} {len(fast_body):>12,} {1:>8.2f}")
+    gz = gzip.compress(fast_body, compresslevel=9)  # GZipMiddleware default level
+    print(f"  {'gzip':<28} {len(gz):>12,} {len(gz) / len(fast_body):>8.2f}")
+    if brotli is not None:
+        br = brotli.compress(fast_body, quality=4)  # BrotliMiddleware quality used by the API
+        print(f"  {'br (quality 4)':<28} {len(br):>12,} {len(br) / len(fast_body):>8.2f}")
+    else:
+        print("  br: brotli not installed, skipped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API JSON serialization and compression")
+    parser.add_argument("--rows", type=int, default=5000, help="rows per payload")
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    random.seed(42)
+    report(f"summary/by-sro ({args.rows} regions)", make_by_sro_payload(args.rows), args.repeat)
+    report(f"timeseries ({args.rows} days)", make_timeseries_payload(args.rows), args.repeat)
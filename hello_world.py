@@ -2,18 +2,157 @@
 import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
 import logging
+import time
 from starlette.staticfiles import StaticFiles
 
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli is optional, fall back to gzip only
+    BrotliMiddleware = None
+
+from processing_state import get_data_version
+from property_parser import CANONICAL_EXTENT_UNIT, SALE_DEED
+from snapshots import SNAPSHOT_DIR, load_manifest, snapshot_key
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# orjson serializes the large list-of-dict payloads far faster than the stdlib encoder.
+# Endpoints returning big lists build the ORJSONResponse themselves, which also skips
+# FastAPI's per-field jsonable_encoder pass over already-plain dicts.
+app = FastAPI(default_response_class=ORJSONResponse)
+
+
+# Serve precomputed snapshots (see snapshots.py) for the default dashboard views.
+# Registered before CORS so that CORS stays the outermost middleware.
+@app.middleware("http")
+async def serve_snapshots(request: Request, call_next):
+    if request.method == "GET":
+        manifest = load_manifest()
+        # Default views are relative to "today", so only serve snapshots written today,
+        # and only for the current data version (a failed or throttled write leaves an older one)
+        if (manifest and manifest.get("date") == datetime.now().strftime("%d-%m-%Y")
+                and manifest.get("version") == await current_data_version()):
+            params = {k: v for k, v in request.query_params.items() if v}
+            snapshot = manifest["views"].get(snapshot_key(request.url.path, params))
+            if snapshot:
+                return FileResponse(
+                    os.path.join(SNAPSHOT_DIR, snapshot),
+                    media_type="application/json",
+                    headers={"X-Snapshot-Version": str(manifest["version"])}
+                )
+    return await call_next(request)
+
+
+# HTTP caching for /market endpoints: the ETag is derived from the query and the
+# processed-data version, so it can be checked before any aggregation runs.
+DATA_VERSION_TTL_SECONDS = 30
+CACHE_CONTROL_TODAY = "public, max-age=60, stale-while-revalidate=300"
+CACHE_CONTROL_HISTORICAL = "public, max-age=3600, stale-while-revalidate=86400"
+
+# Endpoints whose result depends only on the data, not on a date range
+DATE_INDEPENDENT_PATHS = {
+    "/market/value/data_range",
+    "/market/value/daily-intelligence",
+    "/market/sro_codes",
+}
+
+_data_version_cache = {"version": None, "checked": 0.0}
+
+
+def read_data_version():
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    try:
+        return get_data_version(client[os.getenv("MONGO_DB_NAME", "mydatabase")])
+    finally:
+        client.close()
+
+
+async def current_data_version():
+    """
+    Processed-data version, re-read from Mongo at most every DATA_VERSION_TTL_SECONDS.
+    The read is blocking, so it runs in the threadpool instead of on the event loop.
+    """
+    now = time.monotonic()
+    if _data_version_cache["version"] is None or now - _data_version_cache["checked"] > DATA_VERSION_TTL_SECONDS:
+        _data_version_cache["version"] = await run_in_threadpool(read_data_version)
+        _data_version_cache["checked"] = now
+    return _data_version_cache["version"]
+
+
+def range_includes_today(path, params):
+    """
+    True if the requested date range (or the endpoint's default range) contains today.
+    """
+    if path in DATE_INDEPENDENT_PATHS:
+        return False
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    try:
+        if params.get("date"):
+            return datetime.strptime(params["date"], "%d-%m-%Y") == today
+        if params.get("startDate") and params.get("endDate"):
+            start = datetime.strptime(params["startDate"], "%d-%m-%Y")
+            end = datetime.strptime(params["endDate"], "%d-%m-%Y")
+            return start <= today <= end
+    except ValueError:
+        return True
+    # Default ranges all end today
+    return True
+
+
+@app.middleware("http")
+async def http_caching(request: Request, call_next):
+    if request.method != "GET" or not request.url.path.startswith("/market/"):
+        return await call_next(request)
+
+    params = {k: v for k, v in request.query_params.items() if v}
+    includes_today = range_includes_today(request.url.path, params)
+
+    key_parts = [request.url.path, str(await current_data_version())]
+    key_parts += [f"{name}={params[name]}" for name in sorted(params)]
+    if includes_today:
+        # Default ranges move with the calendar even when the data does not
+        key_parts.append(datetime.now().strftime("%d-%m-%Y"))
+    # Compressed and identity bodies are different representations
+    key_parts.append(request.headers.get("accept-encoding", ""))
+    etag = '"' + hashlib.sha1("|".join(key_parts).encode()).hexdigest() + '"'
+
+    # Lower-case names so they replace any etag a FileResponse already carries
+    cache_headers = {
+        "etag": etag,
+        "cache-control": CACHE_CONTROL_TODAY if includes_today else CACHE_CONTROL_HISTORICAL,
+        "vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=cache_headers)
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    # Endpoints report failures as {"error": ...} with a 200, never cache those
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    cached = Response(content=body, status_code=response.status_code)
+    # raw_headers keeps repeated headers such as several Set-Cookie
+    cached.raw_headers = list(response.raw_headers)
+    if not body.startswith(b'{"error"'):
+        for name, value in cache_headers.items():
+            cached.headers[name] = value
+    return cached
+
 
 # Add CORS middleware
 app.add_middleware(
@@ -24,6 +163,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON bodies (brotli when the client accepts it and brotli-asgi is installed, else gzip)
+COMPRESSION_MINIMUM_SIZE = 1000
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, quality=4, minimum_size=COMPRESSION_MINIMUM_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
 # @app.get("/")
 # async def read_root():
 #     return {"Hello": "World"}
@@ -93,6 +239,7 @@ async def get_top10_market_value(date: Optional[str] = None):
         logger.info(f"Match Query for top10: {match_query_log}") # Log the match query
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -100,27 +247,20 @@ async def get_top10_market_value(date: Optional[str] = None):
                             "dateString": "$dateOfRegistration",
                             "format": "%d-%m-%Y"
                         }
-                    },
-                    "considerationValue_numeric": {"$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}}
+                    }
                 }
             },
             {"$match": {"dateOfRegistration_date": {"$gte": start_of_day, "$lte": end_of_day}}}, # Match by converted date object
-            {"$sort": {"considerationValue_numeric": -1}},
+            {"$sort": {"considerationVal": -1}},
             {"$limit": 10},
             {
                 "$project": {
                     "_id": {"$toString": "$_id"},
                     "sroCode": "$sroCode",
                     "sroName": "$sroName", # Directly using sroName from market-value-processed
-                    "considerationValue": "$considerationValue_numeric",
-                    "pricePerExtent": {
-                        "$cond": {
-                            "if": {"$ne": ["$extent", 0]},
-                            "then": {"$divide": ["$considerationValue_numeric", {"$convert": {"input": "$extent", "to": "double", "onError": 0, "onNull": 0}}]},
-                            "else": 0
-                        }
-                    },
-                    "unitOfExtent": "$extentUnit",
+                    "considerationValue": "$considerationVal",
+                    "pricePerExtent": "$pricePerSqYd",
+                    "unitOfExtent": {"$literal": CANONICAL_EXTENT_UNIT},
                     "village": "$village"
                 }
             }
@@ -175,6 +315,7 @@ async def get_market_value_summary(
                 match_query["sroCode"] = {"$in": sro_list}
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -186,31 +327,13 @@ async def get_market_value_summary(
                 }
             },
             {"$match": match_query},
-            {
-                "$addFields": {
-                    "considerationVal_numeric": {"$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}},
-                    "extent_numeric": {"$convert": {"input": "$extent", "to": "double", "onError": 0, "onNull": 0}}
-                }
-            },
-            
-            {
-                "$addFields": {
-                    "pricePerExtent": {
-                        "$cond": {
-                            "if": {"$ne": ["$extent_numeric", 0]},
-                            "then": {"$divide": ["$considerationVal_numeric", "$extent_numeric"]},
-                            "else": 0
-                        }
-                    }
-                }
-            },
             {
                 "$group": {
                     "_id": None,  # Group all documents together
                     "totalTransactions": {"$sum": 1},
-                    "totalMarketValue": {"$sum": "$considerationVal_numeric"},
-                    "totalAreaSold": {"$sum": "$extent_numeric"},
-                    "sumPricePerExtent": {"$sum": "$pricePerExtent"}
+                    "totalMarketValue": {"$sum": "$considerationVal"},
+                    "totalAreaSold": {"$sum": "$extentSqYds"},
+                    "sumPricePerExtent": {"$sum": "$pricePerSqYd"}
                 }
             },
             {
@@ -268,6 +391,7 @@ async def get_market_value_summary(
 
         # Get previous period data
         previous_pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -279,30 +403,13 @@ async def get_market_value_summary(
                 }
             },
             {"$match": previous_match_query},
-            {
-                "$addFields": {
-                    "considerationVal_numeric": {"$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}},
-                    "extent_numeric": {"$convert": {"input": "$extent", "to": "double", "onError": 0, "onNull": 0}}
-                }
-            },
-            {
-                "$addFields": {
-                    "pricePerExtent": {
-                        "$cond": {
-                            "if": {"$ne": ["$extent_numeric", 0]},
-                            "then": {"$divide": ["$considerationVal_numeric", "$extent_numeric"]},
-                            "else": 0
-                        }
-                    }
-                }
-            },
             {
                 "$group": {
                     "_id": None,
                     "totalTransactions": {"$sum": 1},
-                    "totalMarketValue": {"$sum": "$considerationVal_numeric"},
-                    "totalAreaSold": {"$sum": "$extent_numeric"},
-                    "sumPricePerExtent": {"$sum": "$pricePerExtent"}
+                    "totalMarketValue": {"$sum": "$considerationVal"},
+                    "totalAreaSold": {"$sum": "$extentSqYds"},
+                    "sumPricePerExtent": {"$sum": "$pricePerSqYd"}
                 }
             },
             {
@@ -409,6 +516,7 @@ async def get_transactions_by_date(
                 match_query["sroCode"] = {"$in": sro_list}
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -440,7 +548,7 @@ async def get_transactions_by_date(
         logger.info(f"Pipeline for transactions_by_date: {pipeline}")
 
         result = list(collection.aggregate(pipeline))
-        return {"transactions_by_date": result}
+        return ORJSONResponse({"transactions_by_date": result})
 
     except Exception as e:
         return {"error": str(e)}
@@ -487,6 +595,7 @@ async def get_top10_detailed_market_value(
                 match_query["sroCode"] = {"$in": sro_list}
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -498,24 +607,7 @@ async def get_top10_detailed_market_value(
                 }
             },
             {"$match": match_query},
-            {
-                "$addFields": {
-                    "considerationValue_numeric": {"$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}},
-                    "extent_numeric": {"$convert": {"input": "$extent", "to": "double", "onError": 0, "onNull": 0}}
-                }
-            },
-            {
-                "$addFields": {
-                    "pricePerExtent": {
-                        "$cond": {
-                            "if": {"$ne": ["$extent_numeric", 0]},
-                            "then": {"$divide": ["$considerationValue_numeric", "$extent_numeric"]},
-                            "else": 0
-                        }
-                    }
-                }
-            },
-            {"$sort": {"considerationValue_numeric": -1}}, # Sort by numeric consideration value
+            {"$sort": {"considerationVal": -1}}, # Sort by numeric consideration value
             {"$limit": 10},
             {
                 "$project": {
@@ -523,11 +615,11 @@ async def get_top10_detailed_market_value(
                     "sroCode": "$sroCode",
                     "sroName": "$sroName", # Directly using sroName from market-value-processed
                     "village": "$village",
-                    "considerationValue": "$considerationValue_numeric",
-                    "pricePerExtent": "$pricePerExtent",
-                    "unitOfExtent": "$extentUnit",
+                    "considerationValue": "$considerationVal",
+                    "pricePerExtent": "$pricePerSqYd",
+                    "unitOfExtent": {"$literal": CANONICAL_EXTENT_UNIT},
                     "dateOfRegistration": "$dateOfRegistration",
-                    "extent": "$extent_numeric"
+                    "extent": "$extentSqYds"
                 }
             }
         ]
@@ -561,8 +653,10 @@ async def get_sample_document():
         
         sample_doc = collection.find_one({}) # Fetch one document
         if sample_doc:
-            # Convert ObjectId to string for JSON serialization
+            # Convert ObjectIds to strings for JSON serialization
             sample_doc["_id"] = str(sample_doc["_id"])
+            if "sourceId" in sample_doc:
+                sample_doc["sourceId"] = str(sample_doc["sourceId"])
         return {"sample_document": sample_doc}
     except Exception as e:
         return {"error": str(e)}
@@ -583,6 +677,7 @@ async def get_data_range():
         collection = db["market-value-processed"]
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -664,6 +759,7 @@ async def get_timeseries_top10_sum(
                 match_query["sroCode"] = {"$in": sro_list}
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -672,8 +768,7 @@ async def get_timeseries_top10_sum(
                             "format": "%d-%m-%Y"
                             
                         }
-                    },
-                    "considerationValue_numeric": {"$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}}
+                    }
                 }
             },
             {"$match": match_query},
@@ -682,7 +777,7 @@ async def get_timeseries_top10_sum(
             {
                 "$group": {
                     "_id": "$dateOfRegistration_date",
-                    "dailyConsiderationValues": {"$push": "$considerationValue_numeric"}
+                    "dailyConsiderationValues": {"$push": "$considerationVal"}
                 }
             },
             {"$sort": {"_id": 1}}, # Sort by date ascending for time-series
@@ -706,7 +801,7 @@ async def get_timeseries_top10_sum(
 
         result = list(collection.aggregate(pipeline))
 
-        return {"timeseries_data": result}
+        return ORJSONResponse({"timeseries_data": result})
 
     except Exception as e:
         return {"error": str(e)}
@@ -754,6 +849,7 @@ async def get_price_per_extent_timeseries(
                 match_query["sroCode"] = {"$in": sro_list}
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -765,34 +861,17 @@ async def get_price_per_extent_timeseries(
                 }
             },
             {"$match": match_query},
-            {
-                "$addFields": {
-                    "considerationVal_numeric": {"$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}},
-                    "extent_numeric": {"$convert": {"input": "$extent", "to": "double", "onError": 0, "onNull": 0}}
-                }
-            },
-            {
-                "$addFields": {
-                    "pricePerExtent": {
-                        "$cond": {
-                            "if": {"$ne": ["$extent_numeric", 0]},
-                            "then": {"$divide": ["$considerationVal_numeric", "$extent_numeric"]},
-                            "else": 0
-                        }
-                    }
-                }
-            },
             {
                 "$match": {
-                    "pricePerExtent": {"$gt": 0}  # Only include transactions with valid price per extent
+                    "pricePerSqYd": {"$gt": 0}  # Only include transactions with valid price per extent
                 }
             },
             {
                 "$group": {
                     "_id": "$dateOfRegistration_date",
-                    "avgPricePerExtent": {"$avg": "$pricePerExtent"},
+                    "avgPricePerExtent": {"$avg": "$pricePerSqYd"},
                     "totalTransactions": {"$sum": 1},
-                    "totalValue": {"$sum": "$considerationVal_numeric"}
+                    "totalValue": {"$sum": "$considerationVal"}
                 }
             },
             {"$sort": {"_id": 1}},
@@ -808,7 +887,7 @@ async def get_price_per_extent_timeseries(
         ]
 
         result = list(collection.aggregate(pipeline))
-        return {"timeseries_data": result}
+        return ORJSONResponse({"timeseries_data": result})
 
     except Exception as e:
         return {"error": str(e)}
@@ -831,6 +910,7 @@ async def get_daily_market_intelligence():
 
         # Find the most recent date with data in the database
         pipeline_find_date = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -860,6 +940,7 @@ async def get_daily_market_intelligence():
 
         # Pipeline to get all required metrics for the target day
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -867,38 +948,25 @@ async def get_daily_market_intelligence():
                             "dateString": "$dateOfRegistration",
                             "format": "%d-%m-%Y"
                         }
-                    },
-                    "considerationVal_numeric": {"$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}},
-                    "extent_numeric": {"$convert": {"input": "$extent", "to": "double", "onError": 0, "onNull": 0}}
-                }
-            },
-            {"$match": {"dateOfRegistration_date": {"$gte": start_of_day, "$lte": end_of_day}}},
-            {
-                "$addFields": {
-                    "pricePerExtent": {
-                        "$cond": {
-                            "if": {"$ne": ["$extent_numeric", 0]},
-                            "then": {"$divide": ["$considerationVal_numeric", "$extent_numeric"]},
-                            "else": 0
-                        }
                     }
                 }
             },
+            {"$match": {"dateOfRegistration_date": {"$gte": start_of_day, "$lte": end_of_day}}},
             {
                 "$group": {
                     "_id": None,
                     "totalTransactions": {"$sum": 1},
                     "allTransactions": {
                         "$push": {
-                            "considerationVal": "$considerationVal_numeric",
-                            "pricePerExtent": "$pricePerExtent",
+                            "considerationVal": "$considerationVal",
+                            "pricePerExtent": "$pricePerSqYd",
                             "sroName": "$sroName",
-                            "extent": "$extent_numeric"
+                            "extent": "$extentSqYds"
                         }
                     },
                     "largestAreaSold": {
                         "$max": {
-                            "extent": "$extent_numeric",
+                            "extent": "$extentSqYds",
                             "sroName": "$sroName"
                         }
                     },
@@ -989,6 +1057,7 @@ async def get_sro_codes():
         collection = db["market-value-processed"]
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {"$group": {"_id": {"sroCode": "$sroCode", "sroName": "$sroName"}}},
             {"$project": {"_id": 0, "sroCode": "$_id.sroCode", "sroName": "$_id.sroName"}},
             {"$sort": {"sroName": 1}} # Sort by sroName for readability
@@ -1006,6 +1075,9 @@ async def get_sro_codes():
 # Static files are served by Vercel (frontend deployment)
 # app.mount("/", StaticFiles(directory="frontend/build", html=True), name="static")
 
+# Versioned snapshot files are immutable, so they can be cached by browsers and CDNs
+app.mount("/snapshots", StaticFiles(directory=SNAPSHOT_DIR, check_dir=False), name="snapshots")
+
 @app.get("/market/value/summary/by-sro")
 async def get_summary_by_sro(
     startDate: Optional[str] = None,
@@ -1046,6 +1118,7 @@ async def get_summary_by_sro(
         }
 
         pipeline = [
+            {"$match": {"deedType": SALE_DEED}},
             {
                 "$addFields": {
                     "dateOfRegistration_date": {
@@ -1055,12 +1128,6 @@ async def get_summary_by_sro(
                             {"$dateFromString": {"dateString": "$dateOfRegistration", "format": "%d-%m-%Y"}},
                         ]
                     },
-                    "considerationValue_numeric": {
-                        "$convert": {"input": "$considerationVal", "to": "double", "onError": 0, "onNull": 0}
-                    },
-                    "extent_numeric": {
-                        "$convert": {"input": "$extent", "to": "double", "onError": 0, "onNull": 0}
-                    },
                 }
             },
             {"$match": match_query},
@@ -1068,8 +1135,8 @@ async def get_summary_by_sro(
                 "$group": {
                     "_id": {"sroCode": "$sroCode", "sroName": "$sroName"},
                     "totalTransactions": {"$sum": 1},
-                    "totalConsideration": {"$sum": "$considerationValue_numeric"},
-                    "totalArea": {"$sum": "$extent_numeric"},
+                    "totalConsideration": {"$sum": "$considerationVal"},
+                    "totalArea": {"$sum": "$extentSqYds"},
                 }
             },
             {
@@ -1098,7 +1165,7 @@ async def get_summary_by_sro(
         ]
 
         data = list(collection.aggregate(pipeline))
-        return {"startDate": startDate, "endDate": endDate, "regions": data}
+        return ORJSONResponse({"startDate": startDate, "endDate": endDate, "regions": data})
 
     except Exception as e:
         return {"error": str(e)}
@@ -1107,4 +1174,286 @@ async def get_summary_by_sro(
             client.close()
 
 
+@app.get("/market/value/summary/yoy")
+async def get_year_over_year_summary(
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    baselineYears: int = 0,
+):
+    """
+    Returns year-over-year comparison for every SRO in a single read of the
+    daily rollups (market-value-daily):
+    - current: totals for startDate..endDate (default: current month to date)
+    - previousYear: totals for the same calendar dates one year earlier
+    - yoy: absolute and percentage change for volume, value and price per extent
+    - seasonalBaseline (baselineYears > 0): average of the same calendar period
+      over the previous N years, and the change of the current period against it
+    """
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+    database_name = os.getenv("MONGO_DB_NAME", "mydatabase")
 
+    client = None
+    try:
+        client = MongoClient(mongo_uri)
+        db = client[database_name]
+        collection = db["market-value-daily"]
+
+        # Date range handling (default current month to date)
+        today = datetime.now()
+        if not startDate or not endDate:
+            end_date_obj = today.replace(hour=23, minute=59, second=59, microsecond=999999)
+            start_date_obj = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        else:
+            start_date_obj = datetime.strptime(startDate, "%d-%m-%Y").replace(hour=0, minute=0, second=0, microsecond=0)
+            end_date_obj = datetime.strptime(endDate, "%d-%m-%Y").replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        def shift_years(date_obj, years):
+            try:
+                return date_obj.replace(year=date_obj.year - years)
+            except ValueError:
+                # 29 Feb in a non-leap year
+                return date_obj.replace(year=date_obj.year - years, day=28)
+
+        # Period 0 is the requested range, period N is the same dates N years back
+        years_back = max(1, baselineYears)
+        periods = [(shift_years(start_date_obj, n), shift_years(end_date_obj, n)) for n in range(years_back + 1)]
+
+        pipeline = [
+            {"$match": {"$or": [{"date": {"$gte": start, "$lte": end}} for start, end in periods]}},
+            {
+                "$addFields": {
+                    "period": {
+                        "$switch": {
+                            "branches": [
+                                {"case": {"$and": [{"$gte": ["$date", start]}, {"$lte": ["$date", end]}]}, "then": n}
+                                for n, (start, end) in enumerate(periods)
+                            ],
+                            "default": -1
+                        }
+                    }
+                }
+            },
+            {
+                "$group": {
+                    "_id": {"sroCode": "$sroCode", "period": "$period"},
+                    "sroName": {"$first": "$sroName"},
+                    "totalTransactions": {"$sum": "$totalTransactions"},
+                    "totalValue": {"$sum": "$totalValue"},
+                    "totalArea": {"$sum": "$totalArea"}
+                }
+            }
+        ]
+
+        rows = list(collection.aggregate(pipeline))
+
+        def period_metrics(row):
+            if not row:
+                return {"totalTransactions": 0, "totalValue": 0, "averagePricePerExtent": 0}
+            return {
+                "totalTransactions": row["totalTransactions"],
+                "totalValue": row["totalValue"],
+                "averagePricePerExtent": row["totalValue"] / row["totalArea"] if row["totalArea"] else 0
+            }
+
+        def calculate_change(current, previous):
+            return {
+                "change": current - previous,
+                "changePct": (current - previous) / previous * 100 if previous else None
+            }
+
+        by_sro = {}
+        for row in rows:
+            sro = by_sro.setdefault(row["_id"]["sroCode"], {"sroName": row["sroName"], "periods": {}})
+            sro["periods"][row["_id"]["period"]] = row
+
+        regions = []
+        for sro_code, sro in by_sro.items():
+            current = period_metrics(sro["periods"].get(0))
+            previous = period_metrics(sro["periods"].get(1))
+            region = {
+                "sroCode": sro_code,
+                "sroName": sro["sroName"],
+                "current": current,
+                "previousYear": previous,
+                "yoy": {
+                    "transactions": calculate_change(current["totalTransactions"], previous["totalTransactions"]),
+                    "value": calculate_change(current["totalValue"], previous["totalValue"]),
+                    "pricePerExtent": calculate_change(current["averagePricePerExtent"], previous["averagePricePerExtent"])
+                }
+            }
+
+            if baselineYears > 0:
+                # Average only over years that have data, so SROs scraped recently are not dragged to zero
+                baseline_rows = [sro["periods"][n] for n in range(1, baselineYears + 1) if n in sro["periods"]]
+                count = len(baseline_rows)
+                baseline = {
+                    "years": baselineYears,
+                    "yearsWithData": count,
+                    "totalTransactions": sum(r["totalTransactions"] for r in baseline_rows) / count if count else 0,
+                    "totalValue": sum(r["totalValue"] for r in baseline_rows) / count if count else 0,
+                    "averagePricePerExtent": (
+                        sum(r["totalValue"] for r in baseline_rows) / sum(r["totalArea"] for r in baseline_rows)
+                        if count and sum(r["totalArea"] for r in baseline_rows) else 0
+                    )
+                }
+                region["seasonalBaseline"] = baseline
+                region["vsBaseline"] = {
+                    "transactions": calculate_change(current["totalTransactions"], baseline["totalTransactions"]),
+                    "value": calculate_change(current["totalValue"], baseline["totalValue"]),
+                    "pricePerExtent": calculate_change(current["averagePricePerExtent"], baseline["averagePricePerExtent"])
+                }
+
+            regions.append(region)
+
+        regions.sort(key=lambda r: r["current"]["totalValue"], reverse=True)
+
+        return ORJSONResponse({
+            "startDate": start_date_obj.strftime("%d-%m-%Y"),
+            "endDate": end_date_obj.strftime("%d-%m-%Y"),
+            "previousStartDate": periods[1][0].strftime("%d-%m-%Y"),
+            "previousEndDate": periods[1][1].strftime("%d-%m-%Y"),
+            "baselineYears": baselineYears,
+            "regions": regions
+        })
+
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        if client:
+            client.close()
+
+
+@app.get("/market/value/compare")
+async def compare_sros(
+    sroCode: str,
+    metrics: Optional[str] = None,
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+):
+    """
+    Side-by-side comparison of several SROs from one grouped aggregation over
+    the daily rollups (market-value-daily).
+    - sroCode: comma separated list of SRO codes to compare
+    - metrics: comma separated subset of totalTransactions, totalValue,
+      totalArea, averagePricePerExtent (default: all)
+    Every SRO series is aligned on the same date axis, days without
+    registrations are filled with 0.
+    """
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+    database_name = os.getenv("MONGO_DB_NAME", "mydatabase")
+
+    allowed_metrics = ["totalTransactions", "totalValue", "totalArea", "averagePricePerExtent"]
+
+    client = None
+    try:
+        sro_list = [code.strip() for code in sroCode.split(',') if code.strip()]
+        if not sro_list:
+            return {"error": "sroCode must contain at least one SRO code"}
+
+        metric_list = [m.strip() for m in metrics.split(',') if m.strip()] if metrics else allowed_metrics
+        unknown = [m for m in metric_list if m not in allowed_metrics]
+        if unknown:
+            return {"error": f"Unknown metrics: {', '.join(unknown)}. Allowed: {', '.join(allowed_metrics)}"}
+
+        client = MongoClient(mongo_uri)
+        db = client[database_name]
+        collection = db["market-value-daily"]
+
+        today = datetime.now()
+        if not startDate or not endDate:
+            end_date_obj = today.replace(hour=23, minute=59, second=59, microsecond=999999)
+            start_date_obj = (today - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+        else:
+            start_date_obj = datetime.strptime(startDate, "%d-%m-%Y").replace(hour=0, minute=0, second=0, microsecond=0)
+            end_date_obj = datetime.strptime(endDate, "%d-%m-%Y").replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        pipeline = [
+            {
+                "$match": {
+                    "sroCode": {"$in": sro_list},
+                    "date": {"$gte": start_date_obj, "$lte": end_date_obj}
+                }
+            },
+            {
+                "$group": {
+                    "_id": {"sroCode": "$sroCode", "date": "$date"},
+                    "sroName": {"$first": "$sroName"},
+                    "totalTransactions": {"$sum": "$totalTransactions"},
+                    "totalValue": {"$sum": "$totalValue"},
+                    "totalArea": {"$sum": "$totalArea"}
+                }
+            }
+        ]
+
+        rows = list(collection.aggregate(pipeline))
+
+        # Common date axis for every SRO
+        dates = []
+        day = start_date_obj
+        while day <= end_date_obj:
+            dates.append(day.strftime("%d-%m-%Y"))
+            day += timedelta(days=1)
+        date_index = {d: i for i, d in enumerate(dates)}
+
+        per_sro = {
+            code: {
+                "sroName": None,
+                "totalTransactions": [0] * len(dates),
+                "totalValue": [0] * len(dates),
+                "totalArea": [0] * len(dates)
+            }
+            for code in sro_list
+        }
+        for row in rows:
+            sro = per_sro[row["_id"]["sroCode"]]
+            sro["sroName"] = row["sroName"]
+            i = date_index.get(row["_id"]["date"].strftime("%d-%m-%Y"))
+            if i is None:
+                continue
+            sro["totalTransactions"][i] = row["totalTransactions"]
+            sro["totalValue"][i] = row["totalValue"]
+            sro["totalArea"][i] = row["totalArea"]
+
+        regions = []
+        for code in sro_list:
+            sro = per_sro[code]
+            daily_price = [
+                value / area if area else 0
+                for value, area in zip(sro["totalValue"], sro["totalArea"])
+            ]
+            series = {
+                "totalTransactions": sro["totalTransactions"],
+                "totalValue": sro["totalValue"],
+                "totalArea": sro["totalArea"],
+                "averagePricePerExtent": daily_price
+            }
+            total_value = sum(sro["totalValue"])
+            total_area = sum(sro["totalArea"])
+            summary = {
+                "totalTransactions": sum(sro["totalTransactions"]),
+                "totalValue": total_value,
+                "totalArea": total_area,
+                "averagePricePerExtent": total_value / total_area if total_area else 0
+            }
+            regions.append({
+                "sroCode": code,
+                "sroName": sro["sroName"],
+                "series": {m: series[m] for m in metric_list},
+                "summary": {m: summary[m] for m in metric_list}
+            })
+
+        return ORJSONResponse({
+            "startDate": start_date_obj.strftime("%d-%m-%Y"),
+            "endDate": end_date_obj.strftime("%d-%m-%Y"),
+            "metrics": metric_list,
+            "dates": dates,
+            "regions": regions
+        })
+
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        if client:
+            client.close()
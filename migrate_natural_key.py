@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+One-time migration: deduplicate deeds on their natural key
+(state, sroCode, regYear, docno) and create the unique index on it in both
+market-value and market-value-processed.
+
+Older documents have no regYear, it is backfilled from the year of
+dateOfRegistration (or creationTime when the date is missing). For every
+duplicate group the oldest document (lowest _id) is kept.
+
+Run it once before the upserting scrapers / ts_db_processing.py:
+
+    python migrate_natural_key.py --dry-run
+    python migrate_natural_key.py
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+from pymongo import DeleteMany, MongoClient
+
+NATURAL_KEY = ["state", "sroCode", "regYear", "docno"]
+COLLECTIONS = ["market-value", "market-value-processed"]
+DELETE_BATCH_SIZE = 1000
+
+
+def backfill_reg_year(collection):
+    """
+    Set regYear on documents written before it existed.
+    """
+    result = collection.update_many(
+        {"regYear": {"$exists": False}},
+        [
+            {
+                "$set": {
+                    "regYear": {
+                        "$ifNull": [
+                            {"$year": {"$dateFromString": {
+                                "dateString": "$dateOfRegistration",
+                                "format": "%d-%m-%Y",
+                                "onError": None,
+                                "onNull": None
+                            }}},
+                            {"$year": {"$toDate": "$creationTime"}}
+                        ]
+                    }
+                }
+            }
+        ]
+    )
+    return result.modified_count
+
+
+def remove_duplicates(collection, dry_run=False):
+    """
+    Delete all but the oldest document of every natural-key group.
+    Returns (duplicate groups, documents removed).
+    """
+    pipeline = [
+        {"$group": {
+            "_id": {field: f"${field}" for field in NATURAL_KEY},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+
+    groups = 0
+    removed = 0
+    operations = []
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        groups += 1
+        duplicate_ids = sorted(group["ids"])[1:]
+        removed += len(duplicate_ids)
+        operations.append(DeleteMany({"_id": {"$in": duplicate_ids}}))
+        if not dry_run and len(operations) >= DELETE_BATCH_SIZE:
+            collection.bulk_write(operations, ordered=False)
+            operations = []
+
+    if not dry_run and operations:
+        collection.bulk_write(operations, ordered=False)
+    return groups, removed
+
+
+def migrate(db, dry_run=False):
+    for name in COLLECTIONS:
+        collection = db[name]
+        print(f"\n📦 {name}")
+
+        if dry_run:
+            missing = collection.count_documents({"regYear": {"$exists": False}})
+            print(f"  regYear missing on {missing:,} documents (not backfilled in dry run)")
+        else:
+            print(f"  regYear backfilled on {backfill_reg_year(collection):,} documents")
+
+        groups, removed = remove_duplicates(collection, dry_run)
+        verb = "would be removed" if dry_run else "removed"
+        print(f"  {removed:,} duplicate documents {verb} across {groups:,} natural keys")
+
+        if not dry_run:
+            collection.create_index([(field, 1) for field in NATURAL_KEY], unique=True, name="natural_key")
+            print("  ✅ unique natural_key index in place")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicate deeds on (state, sroCode, regYear, docno)")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[os.getenv("MONGO_DB_NAME", "mydatabase")]
+
+    migrate(db, dry_run=args.dry_run)
+    print("\n🎉 Natural key migration completed!")
+    if not args.dry_run:
+        print("Run 'python ts_db_processing.py --full' to refresh rollups and snapshots.")
@@ -0,0 +1,79 @@
+import time
+
+# Small bookkeeping collection shared by the processor, the snapshot job and the API.
+STATE_COLLECTION = "processing-state"
+
+# Document holding the version of market-value-processed; bumped after every ingest.
+DATA_VERSION_ID = "market-value-processed"
+
+
+def get_data_version(db):
+    """
+    Return the current processed-data version (0 if nothing was processed yet).
+    """
+    state = db[STATE_COLLECTION].find_one({"_id": DATA_VERSION_ID})
+    return state["version"] if state else 0
+
+
+def bump_data_version(db):
+    """
+    Mark market-value-processed as changed. The version is the time of the bump in millis.
+    """
+    now_millis = int(time.time() * 1000)
+    db[STATE_COLLECTION].update_one(
+        {"_id": DATA_VERSION_ID},
+        {"$set": {"version": now_millis, "updatedAt": now_millis}},
+        upsert=True
+    )
+    return now_millis
+
+
+# Document holding the latest updatedAt (millis) of the raw market-value deeds that were processed.
+WATERMARK_ID = "market-value-watermark"
+
+
+def get_watermark(db):
+    """
+    Return the latest processed raw deed updatedAt, or None if no run has completed yet
+    (also for watermarks stored as an _id before updatedAt existed).
+    """
+    state = db[STATE_COLLECTION].find_one({"_id": WATERMARK_ID})
+    return state.get("lastUpdatedAt") if state else None
+
+
+def set_watermark(db, last_updated_at):
+    """
+    Record the latest updatedAt of the processed raw deeds.
+    """
+    db[STATE_COLLECTION].update_one(
+        {"_id": WATERMARK_ID},
+        {"$set": {"lastUpdatedAt": last_updated_at, "updatedAt": int(time.time() * 1000)}, "$unset": {"lastId": ""}},
+        upsert=True
+    )
+
+
+# Document holding the change stream resume token of the streaming processor.
+RESUME_TOKEN_ID = "market-value-stream"
+
+
+def get_resume_token(db):
+    """
+    Return the stored change stream resume token, or None to start a new stream.
+    """
+    state = db[STATE_COLLECTION].find_one({"_id": RESUME_TOKEN_ID})
+    return state["resumeToken"] if state else None
+
+
+def set_resume_token(db, resume_token):
+    """
+    Record the resume token of the last change that was fully processed.
+    None clears it (e.g. after the oplog no longer holds the stored position).
+    """
+    if resume_token is None:
+        db[STATE_COLLECTION].delete_one({"_id": RESUME_TOKEN_ID})
+        return
+    db[STATE_COLLECTION].update_one(
+        {"_id": RESUME_TOKEN_ID},
+        {"$set": {"resumeToken": resume_token, "updatedAt": int(time.time() * 1000)}},
+        upsert=True
+    )
@@ -0,0 +1,169 @@
+import re
+from functools import lru_cache
+
+SALE_DEED = "Sale Deed"
+
+# propertyDescription is a sequence of "LABEL: value" fields, e.g.
+#   VILL/COL: MOKILA/MOKILA W-B: 0-0 SURVEY: 25/A 25/AA PLOT: 117
+#   APARTMENT: SRIVARI MEADOWS EXTENT: 300SQ.Yds BUILT: 4254SQ. FT ...
+# Splitting once on ':' gives every field: the last word of each piece is the next
+# label, the rest is the value of the previous one. Pieces whose last word is not a
+# known label (e.g. the '[N]:' boundaries) stay part of the value. W-B is also
+# recognized glued to the word before it (MOKILA/MOKILAW-B:), as the village needs it.
+LABELS = frozenset(["VILL/COL", "W-B", "SURVEY", "PLOT", "FLAT", "HOUSE", "APARTMENT", "EXTENT", "BUILT"])
+
+# Extent value (number part) and up to three words after it inside the EXTENT field; the
+# unit is the longest run of those words that is a known unit (see parse_extent_unit),
+# as free text such as 'Boundires: [N]: ...' can follow the extent
+EXTENT_REGEX = re.compile(r"\s*([\d\.]+)\s*([A-Za-z][A-Za-z\.]*(?: +[A-Za-z][A-Za-z\.]*){0,2})?")
+
+# Extents are stored in square yards. Square yards per unit, keyed on the raw unit
+# upper-cased without dots and spaces (SQ.Yds -> SQYDS, SQ. FT -> SQFT).
+CANONICAL_EXTENT_UNIT = "SQ.Yds"
+SQ_YDS_PER_UNIT = {
+    "SQYDS": 1.0, "SQYD": 1.0, "SQYARDS": 1.0, "SY": 1.0,
+    "SQFT": 1 / 9, "SQFEET": 1 / 9, "SFT": 1 / 9,
+    "SQMTS": 1.19599, "SQMT": 1.19599, "SQM": 1.19599, "SQMETERS": 1.19599,
+    "ACRES": 4840.0, "ACRE": 4840.0, "AC": 4840.0,
+    "GUNTAS": 121.0, "GUNTA": 121.0, "GTS": 121.0,
+    "CENTS": 48.4, "CENT": 48.4,
+    "HECTARES": 11959.9, "HECTARE": 11959.9, "HA": 11959.9,
+}
+
+# deed code and deedType from natureAndValue (first 4-digit code, text up to 'Mkt.Value')
+NATURE_REGEX = re.compile(r"(\d{4})\s+(.+?)\s+Mkt\.Value")
+
+
+def split_fields(prop_desc):
+    """
+    Return {label: value} for the first occurrence of every field label.
+    """
+    fields = {}
+    label = None
+    value = []
+    for piece in prop_desc.split(":"):
+        head, _, tail = piece.rpartition(" ")
+        if tail not in LABELS:
+            if not tail.endswith("W-B"):
+                value.append(piece)
+                continue
+            head, tail = piece[:-3], "W-B"
+        value.append(head)
+        if label is not None and label not in fields:
+            fields[label] = ":".join(value).strip()
+        label = tail
+        value = []
+    if label is not None and label not in fields:
+        fields[label] = ":".join(value).strip()
+    return fields
+
+
+def parse_village(prop_desc, fields):
+    """
+    Village is the text before 'W-B:' (without 'VILL/COL:'), taking the part before
+    a '/' if present. Without 'W-B:' the whole description is used.
+    """
+    if "W-B" not in fields:
+        return prop_desc
+
+    pre_wb_text = prop_desc[:prop_desc.find("W-B:")].strip()
+    if pre_wb_text.startswith("VILL/COL:"):
+        pre_wb_text = pre_wb_text[len("VILL/COL:"):]
+
+    before_slash, slash, after_slash = pre_wb_text.partition("/")
+    before_slash = before_slash.strip()
+    # Use before slash if non-empty, else after slash
+    return before_slash if before_slash or not slash else after_slash.strip()
+
+
+def first_token(fields, label):
+    if label not in fields:
+        return None
+    tokens = fields[label].split()
+    return tokens[0] if tokens else None
+
+
+@lru_cache(maxsize=1024)
+def unit_factor(extent_unit):
+    """
+    Square yards per raw extent unit, None if the unit is not in SQ_YDS_PER_UNIT.
+    A corpus only has a few dozen spellings of units, so lookups are cached.
+    """
+    return SQ_YDS_PER_UNIT.get(extent_unit.upper().replace(".", "").replace(" ", ""))
+
+
+def parse_extent_unit(unit_words):
+    """
+    The longest leading run of unit_words that is a unit in SQ_YDS_PER_UNIT
+    ('SQ. FT Boundires' -> 'SQ. FT'), else the first word as written.
+    """
+    words = unit_words.split()
+    for count in range(len(words), 1, -1):
+        candidate = " ".join(words[:count])
+        if unit_factor(candidate) is not None:
+            return candidate
+    return words[0]
+
+
+@lru_cache(maxsize=1024)
+def normalize_deed_type(raw_deed_type):
+    """
+    deedType with whitespace collapsed and Sale Deed spelled canonically (cached like unit_factor).
+    """
+    deed_type = " ".join(raw_deed_type.split())
+    return SALE_DEED if deed_type.lower() == SALE_DEED.lower() else deed_type
+
+
+def normalize_extent(extent_value, extent_unit):
+    """
+    Convert a raw extent to square yards. Returns None when the value is not a
+    number or the unit is missing or not in SQ_YDS_PER_UNIT.
+    """
+    if extent_value is None or extent_unit is None:
+        return None
+    factor = unit_factor(extent_unit)
+    if factor is None:
+        return None
+    try:
+        return float(extent_value) * factor
+    except ValueError:
+        return None
+
+
+def parse_deed(prop_desc, nature_and_value):
+    """
+    Extract every derived field of a raw deed from propertyDescription and natureAndValue.
+    """
+    fields = split_fields(prop_desc)
+
+    extent_value = None
+    extent_unit = None
+    if "EXTENT" in fields:
+        extent_match = EXTENT_REGEX.match(fields["EXTENT"])
+        if extent_match:
+            extent_value, extent_unit = extent_match.groups()
+            if extent_unit is not None:
+                extent_unit = parse_extent_unit(extent_unit)
+
+    deed_code = None
+    deed_type = None
+    nature_match = NATURE_REGEX.search(nature_and_value)
+    if nature_match:
+        deed_code, deed_type = nature_match.groups()
+        deed_type = normalize_deed_type(deed_type)
+
+    return {
+        "village": parse_village(prop_desc, fields),
+        "extent": extent_value,
+        "extentUnit": extent_unit,
+        "extentSqYds": normalize_extent(extent_value, extent_unit),
+        "surveyNumbers": fields["SURVEY"].split() if "SURVEY" in fields else [],
+        "plotNo": first_token(fields, "PLOT"),
+        "flatNo": first_token(fields, "FLAT"),
+        "houseNo": first_token(fields, "HOUSE"),
+        "apartment": fields["APARTMENT"] if "APARTMENT" in fields else None,
+        "isPlot": "PLOT" in fields,
+        "isFlat": "FLAT" in fields or "APARTMENT" in fields,
+        "deedCode": deed_code,
+        "deedType": deed_type,
+    }
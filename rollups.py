@@ -0,0 +1,93 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from property_parser import SALE_DEED
+
+# Daily per-SRO rollup of market-value-processed. One document per (sroCode, day)
+# so that range/period endpoints can read a few hundred rows instead of scanning deeds.
+# totalArea is in square yards (extentSqYds), totalValue is the summed consideration.
+ROLLUP_COLLECTION = "market-value-daily"
+PROCESSED_COLLECTION = "market-value-processed"
+
+
+def _rollup_pipeline(match_stage=None):
+    """
+    Aggregation that groups processed sale deeds into daily per-SRO totals.
+    """
+    pipeline = [{"$match": {"deedType": SALE_DEED}}]
+    if match_stage:
+        pipeline.append({"$match": match_stage})
+
+    pipeline += [
+        {
+            "$addFields": {
+                "dateOfRegistration_date": {
+                    "$dateFromString": {
+                        "dateString": "$dateOfRegistration",
+                        "format": "%d-%m-%Y",
+                        "onError": None,
+                        "onNull": None
+                    }
+                }
+            }
+        },
+        {"$match": {"dateOfRegistration_date": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": {"sroCode": "$sroCode", "date": "$dateOfRegistration_date"},
+                "sroName": {"$first": "$sroName"},
+                "totalTransactions": {"$sum": 1},
+                "totalValue": {"$sum": "$considerationVal"},
+                "totalArea": {"$sum": "$extentSqYds"}
+            }
+        },
+        {
+            "$project": {
+                "sroCode": "$_id.sroCode",
+                "sroName": 1,
+                "date": "$_id.date",
+                "year": {"$year": "$_id.date"},
+                "month": {"$month": "$_id.date"},
+                "day": {"$dayOfMonth": "$_id.date"},
+                "totalTransactions": 1,
+                "totalValue": 1,
+                "totalArea": 1
+            }
+        }
+    ]
+    return pipeline
+
+
+def rebuild_daily_rollups(db, dates=None):
+    """
+    Recompute the daily rollups from market-value-processed.
+
+    With no dates the whole rollup collection is replaced ($out). With a list of
+    DD-MM-YYYY strings only those days are re-merged, which is what incremental
+    processing uses after touching a handful of days. Readers never see those
+    days empty: rollups are replaced in place, and only the ones of (SRO, day)
+    pairs that no longer have deeds are deleted afterwards.
+    """
+    src = db[PROCESSED_COLLECTION]
+    rollups = db[ROLLUP_COLLECTION]
+
+    if dates is None:
+        src.aggregate(_rollup_pipeline() + [{"$out": ROLLUP_COLLECTION}])
+    else:
+        dates = sorted(set(d for d in dates if d))
+        if not dates:
+            return 0
+        day_objs = [datetime.strptime(d, "%d-%m-%Y") for d in dates]
+        # Every rollup this pass produces carries its stamp, the rest of those days are stale
+        rebuild_id = ObjectId()
+        src.aggregate(
+            _rollup_pipeline({"dateOfRegistration": {"$in": dates}})
+            + [{"$set": {"rebuildId": rebuild_id}},
+               {"$merge": {"into": ROLLUP_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}]
+        )
+        rollups.delete_many({"date": {"$in": day_objs}, "rebuildId": {"$ne": rebuild_id}})
+
+    rollups.create_index([("date", 1), ("sroCode", 1)])
+    rollups.create_index([("month", 1), ("day", 1)])
+    return rollups.count_documents({})
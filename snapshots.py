@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Precomputed dashboard snapshots.
+
+After each ingest the responses for the default dashboard views (and optionally
+the per-SRO variants of them) are computed once and written as versioned JSON
+files:
+
+    <SNAPSHOT_DIR>/<data version>/<view key>.json
+    <SNAPSHOT_DIR>/current.json        (manifest pointing at the live version)
+
+The API serves these files for matching requests and only computes uncommon
+filter combinations live. Point SNAPSHOT_DIR at frontend/public/snapshots to
+also publish them through the Vercel build.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+import orjson
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from processing_state import get_data_version
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+MANIFEST_NAME = "current.json"
+KEEP_VERSIONS = 3
+
+_manifest_cache = {"mtime": None, "manifest": None}
+
+# Views loaded by (almost) every visitor: default date ranges, all SROs
+DEFAULT_VIEWS = [
+    "/market/value/top10",
+    "/market/value/summary",
+    "/market/value/transactions_by_date",
+    "/market/value/top10_detailed",
+    "/market/value/timeseries_top10_sum",
+    "/market/value/price_per_extent_timeseries",
+    "/market/value/summary/by-sro",
+    "/market/value/summary/yoy",
+    "/market/value/daily-intelligence",
+    "/market/value/data_range",
+    "/market/sro_codes",
+]
+
+# Views that are commonly opened for a single SRO with the default date range
+PER_SRO_VIEWS = [
+    "/market/value/summary",
+    "/market/value/transactions_by_date",
+    "/market/value/top10_detailed",
+    "/market/value/price_per_extent_timeseries",
+]
+
+
+def snapshot_key(path, params):
+    """
+    File-name safe key for a request path and its query parameters.
+    """
+    key = path.strip("/").replace("/", "_")
+    for name in sorted(params):
+        key += f"__{name}={params[name]}"
+    return re.sub(r"[^A-Za-z0-9_=.,-]", "-", key)
+
+
+def load_manifest():
+    """
+    Return the current manifest, or None if no snapshot was written yet.
+    The parsed manifest is cached until the file changes.
+    """
+    manifest_path = os.path.join(SNAPSHOT_DIR, MANIFEST_NAME)
+    try:
+        mtime = os.stat(manifest_path).st_mtime
+        if mtime != _manifest_cache["mtime"]:
+            with open(manifest_path) as f:
+                _manifest_cache["manifest"] = json.load(f)
+            _manifest_cache["mtime"] = mtime
+        return _manifest_cache["manifest"]
+    except (OSError, ValueError):
+        return None
+
+
+def _views(sro_codes):
+    views = [(path, {}) for path in DEFAULT_VIEWS]
+    for sro_code in sro_codes:
+        views += [(path, {"sroCode": sro_code}) for path in PER_SRO_VIEWS]
+    return views
+
+
+def write_snapshots(db, per_sro=False):
+    """
+    Compute every snapshot view and publish a new versioned snapshot directory.
+    Returns the manifest that was written.
+    """
+    # Imported here so that hello_world can import this module for the lookup side
+    from hello_world import app
+
+    endpoints = {route.path: route.endpoint for route in app.routes if hasattr(route, "endpoint")}
+
+    sro_codes = []
+    if per_sro:
+        sro_codes = sorted(code for code in db["market-value-processed"].distinct("sroCode") if code)
+
+    version = get_data_version(db)
+    version_dir = os.path.join(SNAPSHOT_DIR, str(version))
+    os.makedirs(version_dir, exist_ok=True)
+
+    views = {}
+    for path, params in _views(sro_codes):
+        result = asyncio.run(endpoints[path](**params))
+        if isinstance(result, dict) and "error" in result:
+            print(f"⚠️ Skipping snapshot for {path} {params}: {result['error']}")
+            continue
+
+        # Large endpoints already return a rendered ORJSONResponse
+        body = result.body if hasattr(result, "body") else orjson.dumps(result, default=str)
+
+        key = snapshot_key(path, params)
+        with open(os.path.join(version_dir, f"{key}.json"), "wb") as f:
+            f.write(body)
+        views[key] = f"{version}/{key}.json"
+
+    manifest = {
+        "version": version,
+        "date": datetime.now().strftime("%d-%m-%Y"),
+        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+        "views": views,
+    }
+
+    # Swap the manifest atomically so readers never see a half written one
+    tmp_path = os.path.join(SNAPSHOT_DIR, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(SNAPSHOT_DIR, MANIFEST_NAME))
+
+    # Keep a few previous versions around for clients/CDNs still holding old URLs
+    old_versions = sorted(
+        (int(name) for name in os.listdir(SNAPSHOT_DIR) if name.isdigit() and int(name) != version),
+        reverse=True,
+    )
+    for old in old_versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, str(old)), ignore_errors=True)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write precomputed dashboard snapshots")
+    parser.add_argument("--per-sro", action="store_true", help="also snapshot the single-SRO variants of the default views")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[os.getenv("MONGO_DB_NAME", "mydatabase")]
+
+    manifest = write_snapshots(db, per_sro=args.per_sro)
+    print(f"✅ Wrote {len(manifest['views'])} snapshots for data version {manifest['version']} to {SNAPSHOT_DIR}")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Long-running processor that keeps market-value-processed, the daily rollups and
+the dashboard snapshots up to date while the scrapers write into market-value.
+
+On a replica set it follows a change stream on market-value and persists the
+resume token in processing-state after every batch, so a restart continues where
+it stopped. On a standalone mongod (no change streams) it polls on the same
+updatedAt watermark ts_db_processing.py uses.
+
+    python stream_processor.py
+    python stream_processor.py --poll --poll-interval 5
+"""
+import argparse
+import time
+
+from pymongo.errors import OperationFailure
+
+from processing_state import (bump_data_version, get_resume_token, get_watermark,
+                              set_resume_token, set_watermark)
+from rollups import rebuild_daily_rollups
+from snapshots import write_snapshots
+from ts_db_processing import (DEFAULT_BATCH_SIZE, db, dst_collection, ensure_indexes, ensure_rejected_indexes,
+                              rejected_collection, run_incremental, src_collection, write_batch)
+
+# A batch is written once it holds batch_size deeds or its oldest change is this old
+MAX_BATCH_DELAY_SECONDS = 2
+
+# Snapshots are a few dozen endpoint calls, refresh them at most this often
+SNAPSHOT_INTERVAL_SECONDS = 60
+
+DEFAULT_POLL_INTERVAL_SECONDS = 5
+
+# Server error codes: change streams need a replica set / the resume point left the oplog
+CHANGE_STREAMS_UNSUPPORTED = {40573}
+CHANGE_STREAM_HISTORY_LOST = {136, 280, 286}
+
+# Raw deeds are inserted by the scrapers, or re-written by their natural-key upserts
+STREAM_PIPELINE = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+
+
+class StreamProcessor:
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, snapshot_interval=SNAPSHOT_INTERVAL_SECONDS):
+        self.batch_size = batch_size
+        self.snapshot_interval = snapshot_interval
+        self.last_snapshot = 0
+        self.snapshot_pending = False
+
+    def publish(self, touched_dates, changed):
+        """
+        Refresh rollups for the touched dates and, if any processed deed changed,
+        bump the data version and (throttled) rewrite the dashboard snapshots.
+        """
+        if touched_dates:
+            rebuild_daily_rollups(db, touched_dates)
+        if changed:
+            bump_data_version(db)
+            self.snapshot_pending = True
+        self.refresh_snapshots()
+
+    def refresh_snapshots(self):
+        if not self.snapshot_pending or time.monotonic() - self.last_snapshot < self.snapshot_interval:
+            return
+        manifest = write_snapshots(db)
+        self.last_snapshot = time.monotonic()
+        self.snapshot_pending = False
+        print(f"  wrote {len(manifest['views'])} dashboard snapshots")
+
+    def process_batch(self, raw_docs, resume_token=None):
+        started = time.perf_counter()
+        touched_dates, rejected_count, changed = write_batch(raw_docs, dst_collection, rejected_collection)
+        self.publish(touched_dates, changed)
+
+        # Positions are only advanced once the batch is fully written and published
+        if resume_token is not None:
+            set_resume_token(db, resume_token)
+        last_updated_at = max(doc.get("updatedAt", 0) for doc in raw_docs)
+        watermark = get_watermark(db)
+        if watermark is None or last_updated_at > watermark:
+            set_watermark(db, last_updated_at)
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ {len(raw_docs)} deeds over {len(touched_dates)} dates processed in {elapsed:.2f}s ({rejected_count} rejected)")
+
+    def catch_up(self):
+        """
+        Process deeds inserted or re-scraped after the watermark. Returns True if a processed deed
+        changed (re-reading the overlap window alone does not count).
+        """
+        counts = run_incremental(self.batch_size)
+        if not counts["changed"]:
+            return False
+        bump_data_version(db)
+        self.snapshot_pending = True
+        return True
+
+    def run_stream(self):
+        """
+        Follow the market-value change stream. Raises OperationFailure when change
+        streams are not available so the caller can fall back to polling.
+        """
+        resume_token = get_resume_token(db)
+        try:
+            with src_collection.watch(STREAM_PIPELINE, full_document="updateLookup",
+                                      resume_after=resume_token, max_await_time_ms=500) as stream:
+                if resume_token is None:
+                    # The stream is open, so anything inserted from now on is seen by it.
+                    # Deeds inserted while nothing was running are picked up from the watermark.
+                    self.catch_up()
+                    set_resume_token(db, stream.resume_token)
+                print("👀 Watching market-value for new deeds (change stream)")
+
+                batch = []
+                batch_started = None
+                while stream.alive:
+                    change = stream.try_next()
+                    if change is not None and change.get("fullDocument") is not None:
+                        batch.append(change["fullDocument"])
+                        batch_started = batch_started or time.monotonic()
+
+                    if batch and (len(batch) >= self.batch_size or time.monotonic() - batch_started >= MAX_BATCH_DELAY_SECONDS):
+                        self.process_batch(batch, stream.resume_token)
+                        batch = []
+                        batch_started = None
+                    elif change is None:
+                        self.refresh_snapshots()
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_HISTORY_LOST and resume_token is not None:
+                # Unwritten changes are not lost: they are after the watermark
+                print("⚠️ Stored resume token is no longer in the oplog, catching up from the watermark.")
+                set_resume_token(db, None)
+                return self.run_stream()
+            raise
+
+    def run_polling(self, poll_interval=DEFAULT_POLL_INTERVAL_SECONDS):
+        """
+        Standalone mongod fallback: process whatever was inserted or re-scraped after the
+        watermark every poll_interval seconds.
+        """
+        print(f"👀 Polling market-value every {poll_interval}s (no change streams)")
+        while True:
+            self.catch_up()
+            self.refresh_snapshots()
+            time.sleep(poll_interval)
+
+    def run(self, poll=False, poll_interval=DEFAULT_POLL_INTERVAL_SECONDS):
+        ensure_indexes(dst_collection)
+        ensure_rejected_indexes(rejected_collection)
+        if not poll:
+            try:
+                return self.run_stream()
+            except OperationFailure as e:
+                if e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                    raise
+                print("Change streams are not available on this deployment, falling back to polling.")
+        return self.run_polling(poll_interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously process market-value into market-value-processed")
+    parser.add_argument("--poll", action="store_true", help="poll on the watermark instead of using a change stream")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL_SECONDS, help="seconds between polls")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="deeds per bulk write")
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL_SECONDS, help="minimum seconds between snapshot refreshes")
+    args = parser.parse_args()
+
+    processor = StreamProcessor(args.batch_size, args.snapshot_interval)
+    try:
+        processor.run(poll=args.poll, poll_interval=args.poll_interval)
+    except KeyboardInterrupt:
+        print("\nStopped.")
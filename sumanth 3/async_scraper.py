@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from deed_parser import parse_document
+from deed_store import upsert_deed
+from docno_bitmap import get_bitmap
+from http_client import POOL_SIZE, get_client
+from main import db, has_data, market_collection, sro_collection
+from pacing import SRO_INITIAL_RATE, get_pacer
+from response_archive import archive_responses
+
+# -------------------------
+# Concurrent version of main.fetch_documents_continuous
+# -------------------------
+# All SROs are crawled at the same time. Total request rate is bounded by one
+# global token bucket (the politeness budget for the registration site) and
+# each SRO has its own bucket and at most PER_SRO_CONCURRENCY requests in
+# flight. The bucket rates follow the pacing module's AIMD rates, so they climb
+# while the server answers quickly and halve on timeouts, 5xx and expired
+# sessions; --rate is the ceiling of the global one. requests is
+# blocking, so every POST runs in a worker thread via asyncio.to_thread, all
+# sharing the pooled session of http_client.
+DEFAULT_RATE = 2.0          # maximum requests per second across all SROs
+DEFAULT_BURST = 4           # tokens the bucket can hold
+PER_SRO_CONCURRENCY = 2     # requests in flight per SRO
+EMPTY_STREAK_LIMIT = 10     # stop an SRO after this many consecutive docnos without data
+
+
+class TokenBucket:
+    """
+    Rate limiter: acquire() waits until a request may be sent. With a controller
+    (a pacing.AimdRate) the rate follows controller.rate instead of being fixed.
+    """
+
+    def __init__(self, rate, capacity, controller=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.controller = controller
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                if self.controller is not None:
+                    self.rate = self.controller.rate
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SroCrawl:
+    """
+    Crawls one SRO from its last_doc_number with up to `concurrency` docnos in flight.
+
+    Responses come back out of order, so last_doc_number is only advanced along the
+    contiguous frontier: once every docno below N is done, it becomes (last docno
+    with data below N) + 1, exactly what the serial crawl would have stored.
+    """
+
+    def __init__(self, sro_doc, year, bucket, concurrency):
+        self.district = sro_doc["district"]
+        self.districtCode = sro_doc["districtCode"]
+        self.state = sro_doc["state"]
+        self.sro_name = sro_doc["sro_name"]
+        self.sro_code = sro_doc["sro_code"]
+        self.year = year
+        self.bucket = bucket
+        self.sro_bucket = TokenBucket(SRO_INITIAL_RATE, concurrency, get_pacer().rate_for(self.sro_code))
+        self.concurrency = concurrency
+
+        self.next_docno = sro_doc.get("last_doc_number", 1)
+        self.frontier = self.next_docno   # every docno below this is done
+        self.results = {}                 # finished docnos at or above the frontier -> had data
+        self.empty_streak = 0
+        self.stopped = False
+        self.saved = 0
+
+    async def fetch(self, docno):
+        """
+        Fetch and store one docno. Returns True if it had data.
+        """
+        bitmap = await asyncio.to_thread(get_bitmap, db, self.sro_code, self.year)
+        if docno in bitmap:
+            return True
+
+        # Retries with backoff and session refreshes happen inside the client
+        await self.sro_bucket.acquire()
+        await self.bucket.acquire()
+        response_text = await asyncio.to_thread(get_client().fetch_deed, self.districtCode, self.sro_code, docno, self.year)
+
+        if not has_data(response_text):
+            return False
+        parsed = parse_document(response_text, self.district, self.districtCode, self.state, self.sro_name, self.sro_code, docno)
+        if parsed:
+            await asyncio.to_thread(upsert_deed, market_collection, parsed, self.year)
+            self.saved += 1
+            print(f"        ✅ {self.sro_code} saved docno {docno}")
+        return True
+
+    async def record(self, docno, found):
+        """
+        Advance the contiguous frontier and checkpoint last_doc_number.
+        """
+        self.results[docno] = found
+        last_found = None
+        while self.frontier in self.results:
+            if self.results.pop(self.frontier):
+                last_found = self.frontier
+                self.empty_streak = 0
+            else:
+                self.empty_streak += 1
+            self.frontier += 1
+
+        if last_found is not None:
+            await asyncio.to_thread(
+                sro_collection.update_one,
+                {"sro_code": self.sro_code},
+                # $max: checkpoints from this SRO's workers may land out of order
+                {"$max": {"last_doc_number": last_found + 1}, "$set": {"last_update_time": int(time.time() * 1000)}}
+            )
+        if self.empty_streak >= EMPTY_STREAK_LIMIT and not self.stopped:
+            self.stopped = True
+            print(f"        ⚠️ {self.sro_code}: no data for {EMPTY_STREAK_LIMIT} consecutive doc numbers, stopping SRO.")
+
+    async def worker(self):
+        while not self.stopped:
+            docno = self.next_docno
+            self.next_docno += 1
+            try:
+                found = await self.fetch(docno)
+            except requests.RequestException as e:
+                # The frontier never passes this docno, so the next run retries it
+                self.stopped = True
+                print(f"        ❌ {self.sro_code}: giving up at docno {docno} ({e}), checkpoint stays before it.")
+                return
+            await self.record(docno, found)
+
+    async def run(self):
+        print(f"\n📌 Fetching docs for {self.district} {self.districtCode} - {self.sro_name} ({self.sro_code}) starting from docno {self.next_docno}")
+        await asyncio.gather(*(self.worker() for _ in range(self.concurrency)))
+        print(f"🏁 {self.sro_code} {self.sro_name}: {self.saved} saved, checked up to docno {self.frontier - 1}")
+        return self.saved
+
+
+async def fetch_documents_concurrent(rate=DEFAULT_RATE, burst=DEFAULT_BURST, per_sro=PER_SRO_CONCURRENCY, sro_codes=None):
+    query = {"sro_code": {"$in": sro_codes}} if sro_codes else {}
+    sro_docs = list(sro_collection.find(query))
+    year = datetime.datetime.now().year
+
+    # Never more blocking calls in flight than the client keeps pooled connections
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=POOL_SIZE))
+
+    pacer = get_pacer()
+    pacer.set_max_rate(rate)
+    bucket = TokenBucket(rate, burst, pacer.global_rate)
+    crawls = [SroCrawl(sro_doc, year, bucket, per_sro) for sro_doc in sro_docs]
+    started = time.monotonic()
+    saved = await asyncio.gather(*(crawl.run() for crawl in crawls))
+    elapsed = time.monotonic() - started
+    print(f"\n📊 {sum(saved)} documents saved across {len(crawls)} SROs in {elapsed / 60:.1f} min")
+    print(f"🌐 {get_client().summary()}")
+    print(f"🚦 {pacer.summary()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch new deeds for all SROs concurrently")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="maximum global requests per second")
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST, help="token bucket capacity")
+    parser.add_argument("--per-sro", type=int, default=PER_SRO_CONCURRENCY, help="requests in flight per SRO")
+    parser.add_argument("--sro", nargs="*", help="only these sro_codes (default: all in sro_codes)")
+    args = parser.parse_args()
+
+    archive_responses(db)
+    asyncio.run(fetch_documents_concurrent(args.rate, args.burst, args.per_sro, args.sro))
+    print("\n🎯 Completed! Data inserted into 'market-value' and last_doc_number updated incrementally in 'sro_codes'.")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Golden-file check and benchmark for deed_parser.parse_document.
+
+Every saved getDeedDetails response (temp.html plus any *.html under --responses)
+is parsed by the fast path and by the BeautifulSoup reference; the documents must
+be identical apart from creationTime. Then both are timed over the same files.
+
+    python benchmark_deed_parser.py
+    python benchmark_deed_parser.py --responses saved_responses/ --repeat 5
+"""
+import argparse
+import glob
+import os
+import time
+
+from deed_parser import parse_document, parse_document_soup
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp.html")
+SRO_ARGS = ("Rangareddy", "15_1", "Telangana", "SHANKARPALLY", "1524", 4307)
+
+# temp.html, as far as the fields go
+GOLDEN_DOCUMENT = {
+    "sno": "1.",
+    "dates": "(R) 28-08-2025 (E) 28-08-2025 (P) 28-08-2025",
+    "natureAndValue": "0101 Sale Deed Mkt.Value:Rs. 5369400 Cons.Value:Rs. 33000000",
+    "marketValue": 5369400,
+    "considerationVal": 33000000,
+    "dateOfRegistration": "28-08-2025",
+    "dateOfExecution": "28-08-2025",
+    "dateOfPresentation": "28-08-2025",
+}
+
+
+def load_responses(responses_dir):
+    paths = [GOLDEN_FILE]
+    if responses_dir:
+        paths += sorted(glob.glob(os.path.join(responses_dir, "**", "*.html"), recursive=True))
+    responses = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            responses.append((path, f.read()))
+    return responses
+
+
+def comparable(document):
+    if document is None:
+        return None
+    return {key: value for key, value in document.items() if key != "creationTime"}
+
+
+def check_equivalence(responses):
+    golden = comparable(parse_document(responses[0][1], *SRO_ARGS))
+    for field, expected in GOLDEN_DOCUMENT.items():
+        assert golden[field] == expected, (field, golden[field], expected)
+
+    for path, html_text in responses:
+        fast = comparable(parse_document(html_text, *SRO_ARGS))
+        reference = comparable(parse_document_soup(html_text, *SRO_ARGS))
+        assert fast == reference, f"{path}: fast parser disagrees with BeautifulSoup\n{fast}\n{reference}"
+
+
+def time_it(fn, responses, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, html_text in responses:
+            fn(html_text, *SRO_ARGS)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark getDeedDetails parsing")
+    parser.add_argument("--responses", help="directory of saved getDeedDetails responses (*.html)")
+    parser.add_argument("--copies", type=int, default=200, help="times each response is parsed per repetition")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    responses = load_responses(args.responses)
+    check_equivalence(responses)
+    print(f"✅ {len(responses)} saved responses parse identically with both parsers")
+
+    corpus = responses * args.copies
+    soup_time = time_it(parse_document_soup, corpus, args.repeat)
+    fast_time = time_it(parse_document, corpus, args.repeat)
+
+    print(f"\n📦 {len(corpus):,} responses")
+    print(f"  {'parser':<32} {'best s':>10} {'docs/sec':>12}")
+    print(f"  {'BeautifulSoup (full tree)':<32} {soup_time:>10.2f} {len(corpus) / soup_time:>12,.0f}")
+    print(f"  {'deed_parser.parse_document':<32} {fast_time:>10.2f} {len(corpus) / fast_time:>12,.0f}")
+    print(f"  speedup: {soup_time / fast_time:.1f}x")
@@ -0,0 +1,287 @@
+import re
+import time
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+# -------------------------
+# getDeedDetails response parsing
+# -------------------------
+# A getDeedDetails page is ~50 KB of menus and scripts around one small table:
+# the first <table class="table ..."> holds a header row and one data row with
+# six cells. Building a BeautifulSoup tree of the whole page just to read six
+# cells dominates the scrapers' CPU time, so parse_document() jumps to that
+# table and streams it through html.parser, collecting the text of the data
+# row's cells only. parse_document_soup() is the original BeautifulSoup
+# version, kept as the reference the fast path is checked against
+# (benchmark_deed_parser.py runs the golden-file comparison).
+MARKET_VALUE_REGEX = re.compile(r"Mkt\.Value:Rs\.?\s*([\d,]+)")
+CONSIDERATION_REGEX = re.compile(r"Cons\.Value:Rs\.?\s*([\d,]+)")
+REG_DATE_REGEX = re.compile(r"\(R\)\s*([\d-]+)")
+EXEC_DATE_REGEX = re.compile(r"\(E\)\s*([\d-]+)")
+PRES_DATE_REGEX = re.compile(r"\(P\)\s*([\d-]+)")
+
+# Start tag of a <table> whose class list contains "table" (what soup.find("table", {"class": "table"}) matches)
+TABLE_START_REGEX = re.compile(r"""<table\b[^>]*?\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))[^>]*>""", re.IGNORECASE)
+
+# Elements html.parser never closes (same list BeautifulSoup treats as empty elements)
+VOID_ELEMENTS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+                           "link", "menuitem", "meta", "param", "source", "track", "wbr",
+                           "basefont", "bgsound", "command", "frame", "image", "isindex",
+                           "nextid", "spacer"])
+
+# Text that BeautifulSoup's get_text() leaves out
+SKIPPED_TEXT_ELEMENTS = frozenset(["script", "style", "template"])
+
+DATA_ROW_INDEX = 1      # rows[0] is the header row
+DATA_CELLS = 6
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class DeedRowParser(HTMLParser):
+    """
+    Collects the text strings of every <td> in the DATA_ROW_INDEX-th <tr> of the
+    first table, with BeautifulSoup's tree semantics: an end tag closes the most
+    recent open element of that name (and everything opened inside it), end tags
+    without an open element are ignored, and a cell's text includes the text of
+    anything nested in it.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []             # open element names, starting with the table
+        self.row_depth = None       # stack index of the data row while it is open
+        self.rows_seen = 0
+        self.cells = []             # per <td> of the data row: list of stripped strings
+        self.open_cells = []        # (stack index, cell index) of <td>s currently open in the row
+        self.pending = []           # text since the last tag, joined like BeautifulSoup's current_data
+        self.skip_depth = None      # stack index of an open <script>/<style>/<template>
+        self.done = False
+
+    def flush_text(self):
+        if not self.pending:
+            return
+        text = "".join(self.pending).strip()
+        self.pending = []
+        if text and self.skip_depth is None:
+            for _, cell in self.open_cells:
+                self.cells[cell].append(text)
+
+    def handle_data(self, data):
+        if self.open_cells:
+            self.pending.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self.flush_text()
+        if tag in VOID_ELEMENTS:
+            return
+        depth = len(self.stack)
+        self.stack.append(tag)
+        if depth == 0:
+            return
+        if tag == "tr":
+            if self.rows_seen == DATA_ROW_INDEX and self.row_depth is None:
+                self.row_depth = depth
+            self.rows_seen += 1
+        elif tag == "td" and self.row_depth is not None:
+            self.open_cells.append((depth, len(self.cells)))
+            self.cells.append([])
+        if tag in SKIPPED_TEXT_ELEMENTS and self.skip_depth is None:
+            self.skip_depth = depth
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self.flush_text()
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth] == tag:
+                break
+        else:
+            return
+        del self.stack[depth:]
+        while self.open_cells and self.open_cells[-1][0] >= depth:
+            self.open_cells.pop()
+        if self.skip_depth is not None and self.skip_depth >= depth:
+            self.skip_depth = None
+        if (self.row_depth is not None and self.row_depth >= depth) or not self.stack:
+            # The data row (or the whole table) is closed, nothing after it matters
+            self.done = True
+            raise _StopParsing()
+
+    def handle_comment(self, data):
+        self.flush_text()
+
+    def handle_decl(self, decl):
+        self.flush_text()
+
+    def handle_pi(self, data):
+        self.flush_text()
+
+    def unknown_decl(self, data):
+        self.flush_text()
+        if data.startswith("CDATA[") and self.open_cells and self.skip_depth is None:
+            text = data[len("CDATA["):].strip()
+            if text:
+                for _, cell in self.open_cells:
+                    self.cells[cell].append(text)
+
+
+def find_deed_table(html_text):
+    """
+    Offset of the first <table> with class "table", or None. Returns -1 when the
+    match sits inside a comment or script, where only a full parse can tell.
+    """
+    for match in TABLE_START_REGEX.finditer(html_text):
+        class_value = next(group for group in match.groups() if group is not None)
+        if "table" not in class_value.split():
+            continue
+        start = match.start()
+        if html_text.rfind("<!--", 0, start) > html_text.rfind("-->", 0, start):
+            return -1
+        if html_text.rfind("<script", 0, start) > html_text.rfind("</script", 0, start):
+            return -1
+        return start
+    return None
+
+
+def _full_parse_cells(html_text):
+    soup = BeautifulSoup(html_text, "html.parser")
+    table = soup.find("table", {"class": "table"})
+    if not table:
+        return None
+    rows = table.find_all("tr")
+    if len(rows) <= DATA_ROW_INDEX:
+        return None
+    return [list(td.stripped_strings) for td in rows[DATA_ROW_INDEX].find_all("td")]
+
+
+def extract_data_row(html_text):
+    """
+    Text strings of each cell of the deed table's data row, or None if the
+    response has no deed table or no data row.
+    """
+    start = find_deed_table(html_text)
+    if start is None:
+        return None
+    if start == -1:
+        return _full_parse_cells(html_text)
+
+    parser = DeedRowParser()
+    try:
+        parser.feed(html_text[start:])
+        parser.close()
+    except _StopParsing:
+        pass
+    if not parser.done:
+        parser.flush_text()
+    if parser.row_depth is None:
+        return None
+    return parser.cells
+
+
+def build_document(cells, district, districtCode, state, sro_name, sro_code, docno):
+    """
+    The market-value document for one deed, from the data row's cell strings.
+    """
+    nature_value_text = " ".join(cells[3])
+    market_match = MARKET_VALUE_REGEX.search(nature_value_text)
+    cons_match = CONSIDERATION_REGEX.search(nature_value_text)
+    market_value = int(market_match.group(1).replace(",", "")) if market_match else 0
+    cons_value = int(cons_match.group(1).replace(",", "")) if cons_match else 0
+
+    dates_text = " ".join(cells[2])
+    reg_match = REG_DATE_REGEX.search(dates_text)
+    exec_match = EXEC_DATE_REGEX.search(dates_text)
+    pres_match = PRES_DATE_REGEX.search(dates_text)
+
+    return {
+        "district": district,
+        "districtCode": districtCode,
+        "state": state,
+        "sroName": sro_name,
+        "sroCode": sro_code,
+        "docno": docno,
+        "sno": "".join(cells[0]),
+        "propertyDescription": " ".join(cells[1]),
+        "dates": dates_text,
+        "natureAndValue": nature_value_text,
+        "marketValue": market_value,
+        "considerationVal": cons_value,
+        "parties": " ".join(cells[4]),
+        "docInfo": " ".join(cells[5]),
+        "dateOfExecution": exec_match.group(1) if exec_match else "",
+        "dateOfPresentation": pres_match.group(1) if pres_match else "",
+        "dateOfRegistration": reg_match.group(1) if reg_match else "",
+        "creationTime": int(time.time() * 1000)
+    }
+
+
+def parse_document(html_text, district, districtCode, state, sro_name, sro_code, docno):
+    """
+    Extract table values into structured dictionary for storage.
+    """
+    cells = extract_data_row(html_text)
+    if cells is None or len(cells) < DATA_CELLS:
+        return None
+    return build_document(cells, district, districtCode, state, sro_name, sro_code, docno)
+
+
+def parse_document_soup(html_text, district, districtCode, state, sro_name, sro_code, docno):
+    """
+    Reference implementation: the same document built from a full BeautifulSoup tree.
+    """
+    soup = BeautifulSoup(html_text, "html.parser")
+    table = soup.find("table", {"class": "table"})
+    if not table:
+        return None
+
+    rows = table.find_all("tr")
+    if len(rows) < 2:
+        return None
+
+    data_row = rows[1].find_all("td")
+    if len(data_row) < 6:
+        return None
+
+    # Extract market and consideration values from text
+    nature_value_text = data_row[3].get_text(" ", strip=True)
+    market_match = re.search(r"Mkt\.Value:Rs\.?\s*([\d,]+)", nature_value_text)
+    cons_match = re.search(r"Cons\.Value:Rs\.?\s*([\d,]+)", nature_value_text)
+    market_value = int(market_match.group(1).replace(",", "")) if market_match else 0
+    cons_value = int(cons_match.group(1).replace(",", "")) if cons_match else 0
+
+    # Extract registration, execution, and presentation dates
+    dates_text = data_row[2].get_text(" ", strip=True)
+    reg_match = re.search(r"\(R\)\s*([\d-]+)", dates_text)
+    exec_match = re.search(r"\(E\)\s*([\d-]+)", dates_text)
+    pres_match = re.search(r"\(P\)\s*([\d-]+)", dates_text)
+    date_of_registration = reg_match.group(1) if reg_match else ""
+    date_of_execution = exec_match.group(1) if exec_match else ""
+    date_of_presentation = pres_match.group(1) if pres_match else ""
+
+    return {
+        "district": district,
+        "districtCode": districtCode,
+        "state": state,
+        "sroName": sro_name,
+        "sroCode": sro_code,
+        "docno": docno,
+        "sno": data_row[0].get_text(strip=True),
+        "propertyDescription": data_row[1].get_text(" ", strip=True),
+        "dates": dates_text,
+        "natureAndValue": nature_value_text,
+        "marketValue": market_value,
+        "considerationVal": cons_value,
+        "parties": data_row[4].get_text(" ", strip=True),
+        "docInfo": data_row[5].get_text(" ", strip=True),
+        "dateOfExecution": date_of_execution,
+        "dateOfPresentation": date_of_presentation,
+        "dateOfRegistration": date_of_registration,
+        "creationTime": int(time.time() * 1000)
+    }
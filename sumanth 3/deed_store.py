@@ -0,0 +1,54 @@
+import time
+
+from pymongo import UpdateOne
+
+from docno_bitmap import mark_docno
+from gap_index import record_docno
+
+# -------------------------
+# Natural key of a deed in 'market-value'
+# -------------------------
+# The same (state, sroCode, regYear, docno) can be fetched by main.py,
+# get_last_100_records.py, auto_fetch_missing.py and missing_doc_checker.py,
+# so every writer upserts on this key instead of inserting. The unique index
+# itself is created by migrate_natural_key.py at the repository root.
+# updatedAt (millis) is stamped on every write, ts_db_processing.py picks up
+# new and re-scraped deeds from a watermark on it.
+NATURAL_KEY = ["state", "sroCode", "regYear", "docno"]
+
+
+def _natural_key_update(parsed, reg_year):
+    doc = dict(parsed)
+    doc["regYear"] = int(reg_year)
+    now_millis = int(time.time() * 1000)
+    doc["updatedAt"] = now_millis
+    creation_time = doc.pop("creationTime", now_millis)
+    return (
+        {field: doc.get(field) for field in NATURAL_KEY},
+        {"$set": doc, "$setOnInsert": {"creationTime": creation_time}},
+    )
+
+
+def upsert_deed(collection, parsed, reg_year):
+    """
+    Insert or refresh a parsed deed keyed on its natural key.
+    creationTime is only set the first time the deed is stored, and new deeds
+    are taken out of their SRO's gap index and set in its docno bitmap.
+    Returns True if the deed was new.
+    """
+    key, update = _natural_key_update(parsed, reg_year)
+    result = collection.update_one(key, update, upsert=True)
+    if result.upserted_id is None:
+        return False
+    record_docno(collection.database, key["sroCode"], key["regYear"], key["docno"])
+    mark_docno(collection.database, key["sroCode"], key["regYear"], key["docno"])
+    return True
+
+
+def upsert_operation(parsed, reg_year):
+    """
+    The same upsert as a bulk_write operation, for bulk rewrites. The caller
+    rebuilds the gap index and bitmaps afterwards.
+    """
+    key, update = _natural_key_update(parsed, reg_year)
+    return UpdateOne(key, update, upsert=True)
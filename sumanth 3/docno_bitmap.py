@@ -0,0 +1,220 @@
+import argparse
+import datetime
+import threading
+import time
+
+from bson.binary import Binary
+from pymongo import MongoClient, ReplaceOne
+
+# -------------------------
+# Docno presence bitmaps per (SRO, year)
+# -------------------------
+# Bit d of the bitmap is set when market-value holds docno d of that SRO and
+# registration year, so "do we already have it" is a bit test instead of a
+# query, and coverage is a popcount. A year of a busy SRO (~100k docnos) is
+# ~12 KB, stored as BSON binary in market-value-bitmaps:
+#
+#   {"_id": "1524:2025", "sroCode": "1524", "regYear": 2025,
+#    "bits": Binary(...), "count": 4290, "version": 17}
+#
+# upsert_deed() sets the bit of every new deed; scrapers read bitmaps through
+# get_bitmap(), which caches them in memory for CACHE_TTL_SECONDS.
+BITMAPS_COLLECTION = "market-value-bitmaps"
+
+CACHE_TTL_SECONDS = 60
+MAX_UPDATE_ATTEMPTS = 20
+
+
+class DocnoBitmap:
+    def __init__(self, sro_code, year, bits=b"", version=0):
+        self.sro_code = sro_code
+        self.year = int(year)
+        self.bits = bytearray(bits)
+        self.version = version
+
+    def __contains__(self, docno):
+        byte = docno >> 3
+        return 0 <= byte < len(self.bits) and bool(self.bits[byte] & (1 << (docno & 7)))
+
+    def add(self, docno):
+        """
+        Set the bit of docno. Returns False if it was already set.
+        """
+        if docno in self:
+            return False
+        byte = docno >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        self.bits[byte] |= 1 << (docno & 7)
+        return True
+
+    def count(self, start_docno=None, end_docno=None):
+        """
+        Number of docnos held between start_docno and end_docno (inclusive, default: all).
+        """
+        start = max(0, start_docno or 0)
+        value = int.from_bytes(self.bits, "little") >> start
+        if end_docno is not None:
+            if end_docno < start:
+                return 0
+            value &= (1 << (end_docno - start + 1)) - 1
+        return bin(value).count("1")
+
+    def coverage(self, start_docno, end_docno):
+        """
+        Fraction of docnos between start_docno and end_docno that are held.
+        """
+        if end_docno < start_docno:
+            return 0.0
+        return self.count(start_docno, end_docno) / (end_docno - start_docno + 1)
+
+    def to_document(self):
+        return {
+            "_id": bitmap_id(self.sro_code, self.year),
+            "sroCode": self.sro_code,
+            "regYear": self.year,
+            "bits": Binary(bytes(self.bits)),
+            "count": self.count(),
+            "version": self.version,
+            "updatedAt": int(time.time() * 1000),
+        }
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(document["sroCode"], document["regYear"], document["bits"], document["version"])
+
+
+def bitmap_id(sro_code, year):
+    return f"{sro_code}:{int(year)}"
+
+
+_cache = {}     # (sro_code, year) -> (DocnoBitmap, monotonic time loaded)
+_cache_lock = threading.Lock()
+
+
+def _cache_put(bitmap):
+    with _cache_lock:
+        _cache[(bitmap.sro_code, bitmap.year)] = (bitmap, time.monotonic())
+
+
+def get_bitmap(db, sro_code, year, max_age=CACHE_TTL_SECONDS):
+    """
+    The presence bitmap of one SRO and year, from the cache if it is recent
+    enough, built from market-value the first time.
+    """
+    year = int(year)
+    with _cache_lock:
+        cached = _cache.get((sro_code, year))
+    if cached and time.monotonic() - cached[1] < max_age:
+        return cached[0]
+
+    document = db[BITMAPS_COLLECTION].find_one({"_id": bitmap_id(sro_code, year)})
+    if document is None:
+        rebuild_bitmaps(db, sro_code, year)
+        document = db[BITMAPS_COLLECTION].find_one({"_id": bitmap_id(sro_code, year)})
+    bitmap = DocnoBitmap.from_document(document) if document else DocnoBitmap(sro_code, year)
+    _cache_put(bitmap)
+    return bitmap
+
+
+def mark_docno(db, sro_code, year, docno):
+    """
+    Set the bit of a newly stored docno. Concurrent scrapers write the same
+    bitmap, so the write only applies to the version it was computed from and
+    is retried otherwise. An SRO without a bitmap yet gets it built from
+    market-value first, so the deeds stored before are not reported absent.
+    """
+    collection = db[BITMAPS_COLLECTION]
+    _id = bitmap_id(sro_code, year)
+    docno = int(docno)
+    rebuilt = False
+
+    for _ in range(MAX_UPDATE_ATTEMPTS):
+        document = collection.find_one({"_id": _id})
+        if document is None and not rebuilt:
+            rebuild_bitmaps(db, sro_code, year)
+            rebuilt = True
+            document = collection.find_one({"_id": _id})
+        bitmap = DocnoBitmap.from_document(document) if document else DocnoBitmap(sro_code, year)
+        if not bitmap.add(docno):
+            _cache_put(bitmap)
+            return
+
+        previous_version = bitmap.version
+        bitmap.version += 1
+        if document is None:
+            result = collection.update_one({"_id": _id}, {"$setOnInsert": bitmap.to_document()}, upsert=True)
+            applied = result.upserted_id is not None
+        else:
+            result = collection.replace_one({"_id": _id, "version": previous_version}, bitmap.to_document())
+            applied = result.modified_count == 1
+        if applied:
+            _cache_put(bitmap)
+            return
+    raise RuntimeError(f"Could not update the docno bitmap of {_id} after {MAX_UPDATE_ATTEMPTS} attempts")
+
+
+def rebuild_bitmaps(db, sro_code=None, year=None):
+    """
+    Recompute bitmaps from market-value for one or all SROs / years.
+    One SRO and year without any deed gets an empty bitmap, so get_bitmap()
+    does not rebuild it again on every cache miss. Returns the number of
+    bitmaps written; bitmaps that come out unchanged are not rewritten.
+    """
+    match = {"docno": {"$type": "number"}, "regYear": {"$exists": True}}
+    if sro_code:
+        match["sroCode"] = sro_code
+    if year:
+        match["regYear"] = int(year)
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"sroCode": "$sroCode", "regYear": "$regYear"}, "docnos": {"$push": "$docno"}}}
+    ]
+
+    existing_match = {}
+    if sro_code:
+        existing_match["sroCode"] = sro_code
+    if year:
+        existing_match["regYear"] = int(year)
+    existing = {document["_id"]: DocnoBitmap.from_document(document)
+                for document in db[BITMAPS_COLLECTION].find(existing_match)}
+
+    version = int(time.time() * 1000)
+    bitmaps = []
+    for group in db["market-value"].aggregate(pipeline, allowDiskUse=True):
+        bitmap = DocnoBitmap(group["_id"]["sroCode"], group["_id"]["regYear"], version=version)
+        for docno in group["docnos"]:
+            if docno >= 0:
+                bitmap.add(int(docno))
+        bitmaps.append(bitmap)
+    if not bitmaps and sro_code and year:
+        bitmaps.append(DocnoBitmap(sro_code, year, version=version))
+
+    requests = []
+    for bitmap in bitmaps:
+        _id = bitmap_id(bitmap.sro_code, bitmap.year)
+        current = existing.get(_id)
+        if current is not None and current.bits == bitmap.bits:
+            _cache_put(current)
+            continue
+        requests.append(ReplaceOne({"_id": _id}, bitmap.to_document(), upsert=True))
+        _cache_put(bitmap)
+
+    if requests:
+        db[BITMAPS_COLLECTION].bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the docno presence bitmaps from market-value")
+    parser.add_argument("--sro", help="only this sro_code")
+    parser.add_argument("--year", type=int, help="only this registration year")
+    args = parser.parse_args()
+
+    db = MongoClient("mongodb://localhost:27017/")["mydatabase"]
+    started = time.perf_counter()
+    written = rebuild_bitmaps(db, args.sro, args.year)
+    print(f"✅ Rebuilt {written} bitmaps in {time.perf_counter() - started:.1f}s")
+    for document in db[BITMAPS_COLLECTION].find({"regYear": args.year or datetime.datetime.now().year}).sort("sroCode", 1):
+        print(f"  {document['sroCode']:<8} {document['count']} docnos held, {len(document['bits'])} bytes")
@@ -0,0 +1,237 @@
+import argparse
+import bisect
+import datetime
+import time
+
+from pymongo import MongoClient, ReplaceOne
+
+# -------------------------
+# Missing-docno index per (SRO, year)
+# -------------------------
+# One document per sroCode and regYear holding the docno intervals that are not
+# in market-value yet, below the highest docno we hold:
+#
+#   {"_id": "1524:2025", "sroCode": "1524", "regYear": 2025,
+#    "minDocno": 1, "maxDocno": 4307, "count": 4290, "version": 17,
+#    "gaps": [[12, 12], [250, 261], ...]}
+#
+# upsert_deed() keeps it current on every new deed, so listing missing ranges
+# never scans deeds. rebuild_gap_index() recomputes it from market-value with one
+# run-length aggregation ($setWindowFields, MongoDB 5.0+).
+GAPS_COLLECTION = "market-value-gaps"
+
+SEQUENTIAL_RUN = 10     # docnos in a row that mark where an SRO's history really starts
+MAX_UPDATE_ATTEMPTS = 20
+
+
+def index_id(sro_code, year):
+    return f"{sro_code}:{int(year)}"
+
+
+def get_index(db, sro_code, year):
+    return db[GAPS_COLLECTION].find_one({"_id": index_id(sro_code, year)})
+
+
+def _add_docno(index, docno):
+    """
+    The index with docno added, as a new dict (index may be None).
+    """
+    if index is None:
+        return {"minDocno": docno, "maxDocno": docno, "count": 1, "gaps": [] if docno == 1 else [[1, docno - 1]]}
+
+    gaps = [list(gap) for gap in index["gaps"]]
+    if docno > index["maxDocno"]:
+        if docno > index["maxDocno"] + 1:
+            gaps.append([index["maxDocno"] + 1, docno - 1])
+        max_docno = docno
+    else:
+        max_docno = index["maxDocno"]
+        position = bisect.bisect_right(gaps, [docno, float("inf")]) - 1
+        if position < 0 or gaps[position][1] < docno:
+            return None     # already present
+        start, end = gaps.pop(position)
+        gaps[position:position] = [gap for gap in ([start, docno - 1], [docno + 1, end]) if gap[0] <= gap[1]]
+
+    return {"minDocno": min(index["minDocno"], docno), "maxDocno": max_docno,
+            "count": index["count"] + 1, "gaps": gaps}
+
+
+def record_docno(db, sro_code, year, docno):
+    """
+    Mark one newly stored docno as present. Concurrent scrapers update the same
+    index, so the write only applies to the version it was computed from and is
+    retried otherwise. An SRO without an index yet gets it built from
+    market-value first, so the deeds stored before are not reported missing.
+    """
+    collection = db[GAPS_COLLECTION]
+    _id = index_id(sro_code, year)
+    docno = int(docno)
+    rebuilt = False
+
+    for _ in range(MAX_UPDATE_ATTEMPTS):
+        index = collection.find_one({"_id": _id})
+        if index is None and not rebuilt:
+            rebuild_gap_index(db, sro_code, year)
+            rebuilt = True
+            index = collection.find_one({"_id": _id})
+        updated = _add_docno(index, docno)
+        if updated is None:
+            return
+        updated.update({"sroCode": sro_code, "regYear": int(year), "updatedAt": int(time.time() * 1000)})
+
+        if index is None:
+            result = collection.update_one({"_id": _id}, {"$setOnInsert": dict(updated, version=1)}, upsert=True)
+            if result.upserted_id is not None:
+                return
+        else:
+            result = collection.update_one({"_id": _id, "version": index["version"]},
+                                           {"$set": updated, "$inc": {"version": 1}})
+            if result.modified_count:
+                return
+    raise RuntimeError(f"Could not update the gap index of {_id} after {MAX_UPDATE_ATTEMPTS} attempts")
+
+
+def rebuild_gap_index(db, sro_code=None, year=None):
+    """
+    Recompute the gap index from market-value for one or all SROs / years.
+    Indexes that come out unchanged are not rewritten. Returns the number
+    of (SRO, year) indexes written.
+    """
+    match = {"docno": {"$type": "number"}, "regYear": {"$exists": True}}
+    if sro_code:
+        match["sroCode"] = sro_code
+    if year:
+        match["regYear"] = int(year)
+
+    pipeline = [
+        {"$match": match},
+        # Previous docno of the same SRO and year, in docno order
+        {"$setWindowFields": {
+            "partitionBy": {"sroCode": "$sroCode", "regYear": "$regYear"},
+            "sortBy": {"docno": 1},
+            "output": {"previous": {"$shift": {"output": "$docno", "by": -1, "default": 0}}}
+        }},
+        {"$group": {
+            "_id": {"sroCode": "$sroCode", "regYear": "$regYear"},
+            "minDocno": {"$min": "$docno"},
+            "maxDocno": {"$max": "$docno"},
+            "count": {"$sum": 1},
+            # A jump of more than one docno is a gap between two runs
+            "gaps": {"$push": {"$cond": [
+                {"$gt": [{"$subtract": ["$docno", "$previous"]}, 1]},
+                [{"$add": ["$previous", 1]}, {"$subtract": ["$docno", 1]}],
+                None
+            ]}}
+        }},
+        {"$set": {"gaps": {"$filter": {"input": "$gaps", "cond": {"$ne": ["$$this", None]}}}}}
+    ]
+
+    existing_match = {}
+    if sro_code:
+        existing_match["sroCode"] = sro_code
+    if year:
+        existing_match["regYear"] = int(year)
+    existing = {
+        index["_id"]: index
+        for index in db[GAPS_COLLECTION].find(existing_match, {"minDocno": 1, "maxDocno": 1, "count": 1, "gaps": 1})
+    }
+
+    now_millis = int(time.time() * 1000)
+    requests = []
+    for group in db["market-value"].aggregate(pipeline, allowDiskUse=True):
+        _id = index_id(group["_id"]["sroCode"], group["_id"]["regYear"])
+        computed = {
+            "minDocno": int(group["minDocno"]),
+            "maxDocno": int(group["maxDocno"]),
+            "count": group["count"],
+            "gaps": sorted([int(start), int(end)] for start, end in group["gaps"]),
+        }
+        if existing.get(_id) == {"_id": _id, **computed}:
+            continue
+        requests.append(ReplaceOne({"_id": _id}, {
+            "sroCode": group["_id"]["sroCode"],
+            "regYear": int(group["_id"]["regYear"]),
+            **computed,
+            "version": now_millis,
+            "updatedAt": now_millis,
+        }, upsert=True))
+
+    if requests:
+        db[GAPS_COLLECTION].bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+def missing_ranges(index, start_docno, end_docno):
+    """
+    Missing docno intervals [start, end] between start_docno and end_docno
+    (inclusive). Everything above the highest stored docno counts as missing.
+    """
+    if index is None:
+        return [(start_docno, end_docno)] if start_docno <= end_docno else []
+
+    ranges = []
+    for gap_start, gap_end in index["gaps"]:
+        if gap_end < start_docno:
+            continue
+        if gap_start > end_docno:
+            break
+        ranges.append((max(gap_start, start_docno), min(gap_end, end_docno)))
+    tail_start = max(index["maxDocno"] + 1, start_docno)
+    if tail_start <= end_docno:
+        ranges.append((tail_start, end_docno))
+    return ranges
+
+
+def missing_docnos(index, start_docno, end_docno):
+    return [docno for start, end in missing_ranges(index, start_docno, end_docno) for docno in range(start, end + 1)]
+
+
+def missing_count(index, start_docno, end_docno):
+    return sum(end - start + 1 for start, end in missing_ranges(index, start_docno, end_docno))
+
+
+def sequential_start_point(index, run_length=SEQUENTIAL_RUN):
+    """
+    First docno of the first run of run_length stored docnos in a row,
+    or the lowest stored docno if there is no such run.
+    """
+    run_start = index["minDocno"]
+    for gap_start, gap_end in index["gaps"]:
+        if gap_end < run_start:
+            continue    # the gap below the first stored docno
+        if gap_start - run_start >= run_length:
+            return run_start
+        run_start = gap_end + 1
+    if index["maxDocno"] - run_start + 1 >= run_length:
+        return run_start
+    return index["minDocno"]
+
+
+def get_year_indexes(db, year):
+    """
+    All SRO gap indexes of one year, building the ones of SROs in sro_codes
+    that have none yet from market-value.
+    """
+    indexed = set(db[GAPS_COLLECTION].distinct("sroCode", {"regYear": int(year)}))
+    sro_codes = set(db["sro_codes"].distinct("sro_code")) - indexed
+    if not indexed:
+        rebuild_gap_index(db, year=year)
+    else:
+        for sro_code in sorted(sro_codes):
+            rebuild_gap_index(db, sro_code, year)
+    return list(db[GAPS_COLLECTION].find({"regYear": int(year)}).sort("sroCode", 1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the per-SRO missing docno index from market-value")
+    parser.add_argument("--sro", help="only this sro_code")
+    parser.add_argument("--year", type=int, help="only this registration year")
+    args = parser.parse_args()
+
+    db = MongoClient("mongodb://localhost:27017/")["mydatabase"]
+    started = time.perf_counter()
+    written = rebuild_gap_index(db, args.sro, args.year)
+    print(f"✅ Rebuilt gap indexes, {written} changed, in {time.perf_counter() - started:.1f}s")
+    for index in db[GAPS_COLLECTION].find({"regYear": args.year or datetime.datetime.now().year}).sort("sroCode", 1):
+        missing = missing_count(index, index["minDocno"], index["maxDocno"])
+        print(f"  {index['sroCode']:<8} {index['minDocno']}-{index['maxDocno']:<10} {len(index['gaps'])} gaps, {missing} docnos missing")
@@ -0,0 +1,173 @@
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# -------------------------
+# Shared HTTP client for registration.telangana.gov.in
+# -------------------------
+# One pooled keep-alive session for all getDeedDetails requests. The JSESSIONID
+# is obtained by loading districtList.htm (the page the search form lives on)
+# and is refreshed automatically when the server stops answering with either a
+# deed table or the "not found" message. Every scraper goes through fetch_deed().
+BASE_URL = "https://registration.telangana.gov.in"
+DEED_DETAILS_URL = f"{BASE_URL}/getDeedDetails.htm"
+DISTRICT_LIST_URL = f"{BASE_URL}/districtList.htm"
+
+HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "Content-Type": "application/x-www-form-urlencoded",
+    "Origin": BASE_URL,
+    "Referer": DISTRICT_LIST_URL,
+    "User-Agent": "Mozilla/5.0",
+}
+
+NO_DATA_PHRASE = "Details of the document not found in the Records, contact SRO"
+DEED_TABLE_MARKER = 'class="table'
+
+POOL_SIZE = 32          # keep-alive connections kept open (>= concurrent requests)
+MAX_ATTEMPTS = 4        # attempts per request on timeouts, connection errors and 5xx
+BACKOFF_BASE = 1.0      # seconds, doubled per attempt, full jitter
+REQUEST_TIMEOUT = 30
+
+
+class SessionExpired(requests.RequestException):
+    """The server kept answering without deed data after a session refresh."""
+
+
+class DeedClient:
+    def __init__(self, pool_size=POOL_SIZE, max_attempts=MAX_ATTEMPTS, timeout=REQUEST_TIMEOUT):
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(HEADERS)
+
+        # A JSESSIONID from the environment skips the first bootstrap
+        if os.getenv("TELANGANA_JSESSIONID"):
+            self.session.cookies.set("JSESSIONID", os.getenv("TELANGANA_JSESSIONID"), domain="registration.telangana.gov.in")
+
+        self.lock = threading.Lock()
+        self.session_generation = 0
+        # Updated from many worker threads; its own lock so a session refresh
+        # (which holds self.lock during a request) does not stall them
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "refreshes": 0, "errors": 0, "seconds": 0.0}
+        self.listeners = []     # called as listener(elapsed_seconds, outcome, sro_code) after every attempt
+        self.archive = None     # called as archive(district_code, sro_code, docno, year, html) for every page returned
+
+    def bootstrap(self, seen_generation=None):
+        """
+        Load districtList.htm to get a fresh JSESSIONID. Concurrent callers that saw
+        the same expired session only refresh it once.
+        """
+        with self.lock:
+            if seen_generation is not None and seen_generation != self.session_generation:
+                return
+            self.session.cookies.clear()
+            self.session.get(DISTRICT_LIST_URL, timeout=self.timeout)
+            self.session_generation += 1
+            with self.stats_lock:
+                self.stats["refreshes"] += 1
+            print(f"        🔑 New session ({self.session.cookies.get('JSESSIONID', 'no JSESSIONID')[:12]}...)")
+
+    def record(self, elapsed, outcome, sro_code=None, counted=True):
+        """
+        Per-request timing: update the stats and notify listeners (e.g. pacing).
+        """
+        with self.stats_lock:
+            if counted:
+                self.stats["requests"] += 1
+                self.stats["seconds"] += elapsed
+            if outcome != "ok":
+                self.stats["errors"] += 1
+        for listener in self.listeners:
+            listener(elapsed, outcome, sro_code)
+
+    def post(self, payload):
+        """
+        POST to getDeedDetails.htm, retrying timeouts, connection errors and 5xx
+        with jittered exponential backoff.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.post(DEED_DETAILS_URL, data=payload, timeout=self.timeout)
+                outcome = "server_error" if response.status_code >= 500 else "ok"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response = None
+                outcome = "timeout" if isinstance(e, requests.Timeout) else "connection_error"
+            self.record(time.perf_counter() - started, outcome, payload["sroCode"])
+
+            if outcome == "ok":
+                return response
+            if attempt == self.max_attempts:
+                if response is not None:
+                    response.raise_for_status()
+                raise requests.ConnectionError(f"getDeedDetails failed after {attempt} attempts ({outcome})")
+            with self.stats_lock:
+                self.stats["retries"] += 1
+            time.sleep(random.uniform(0, BACKOFF_BASE * 2 ** attempt))
+
+    def fetch_deed(self, district_code, sro_code, docno, year):
+        """
+        Return the getDeedDetails HTML for one document, refreshing the session once if it expired.
+        """
+        if not self.session.cookies.get("JSESSIONID"):
+            self.bootstrap(self.session_generation)
+
+        payload = {
+            "deedsel": "1",
+            "districtCode": district_code,
+            "sroCode": sro_code,
+            "doctno": str(docno),
+            "regyear": str(year)
+        }
+        for refreshed in (False, True):
+            generation = self.session_generation
+            response = self.post(payload)
+            if DEED_TABLE_MARKER in response.text or NO_DATA_PHRASE in response.text:
+                if self.archive:
+                    # Archiving is best effort, a failure must not fail the fetch
+                    try:
+                        self.archive(district_code, sro_code, docno, year, response.text)
+                    except Exception as e:
+                        print(f"        ⚠️ Could not archive {sro_code}/{docno}/{year}: {e}")
+                return response.text
+            if refreshed:
+                break
+            self.record(0.0, "session_expired", sro_code, counted=False)
+            self.bootstrap(generation)
+        raise SessionExpired(f"No deed data for {sro_code}/{docno}/{year} even after refreshing the session")
+
+    def summary(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        requests_made = stats["requests"]
+        average = stats["seconds"] / requests_made if requests_made else 0
+        return (f"{requests_made} requests, avg {average * 1000:.0f} ms, {stats['retries']} retries, "
+                f"{stats['errors']} errors, {stats['refreshes']} session refreshes")
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = DeedClient()
+        return _default_client
+
+
+def fetch_deed(district_code, sro_code, docno, year):
+    """
+    fetch_deed on the shared process-wide client.
+    """
+    return get_client().fetch_deed(district_code, sro_code, docno, year)
@@ -0,0 +1,347 @@
+import argparse
+import datetime
+import multiprocessing
+import os
+import socket
+import time
+
+import requests
+from pymongo import ASCENDING, MongoClient, ReturnDocument, UpdateOne
+
+from deed_parser import parse_document
+from deed_store import upsert_deed
+from docno_bitmap import get_bitmap
+from gap_index import get_year_indexes, missing_ranges, sequential_start_point
+from http_client import fetch_deed, get_client
+from pacing import get_pacer, pace
+from response_archive import archive_responses
+
+# -------------------------
+# Scrape job queue
+# -------------------------
+# Work is split into (SRO, year, docno range) jobs in scrape-jobs. Job _ids are
+# the JOB_SIZE-aligned chunk (1-100, 101-200, ...), so planning the same docnos
+# twice yields the same job _ids and nothing is queued twice. The chunk at the
+# frontier is only fetched up to endDocno, the frontier when it was planned;
+# later plans extend endDocno in place and queue the job again for the new
+# docnos. Done jobs whose docnos are still missing in the gap index are queued
+# again too, but attempts are never reset, so docnos that stay empty are tried
+# at most MAX_ATTEMPTS times. A worker leases a job
+# for LEASE_SECONDS, renews the lease while it works and checkpoints nextDocno
+# with every renewal; when a worker dies its lease expires and another worker
+# resumes the job from the checkpoint. Failed attempts go back to pending with
+# a growing delay until MAX_ATTEMPTS, then the job is marked failed.
+#
+#   python job_queue.py --plan              queue missing docnos of the current year
+#   python job_queue.py --work --workers 4  run 4 worker processes
+#   python job_queue.py --status
+MONGO_URI = "mongodb://localhost:27017/"
+JOBS_COLLECTION = "scrape-jobs"
+
+JOB_SIZE = 100              # docnos per job
+LEASE_SECONDS = 120         # a lease not renewed for this long is taken over
+HEARTBEAT_SECONDS = 30      # lease renewal + progress checkpoint interval
+MAX_ATTEMPTS = 5
+RETRY_DELAY_SECONDS = 60    # doubled per failed attempt
+IDLE_SLEEP_SECONDS = 10     # worker poll interval when the queue is empty
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def ensure_job_indexes(db):
+    jobs = db[JOBS_COLLECTION]
+    jobs.create_index([("status", ASCENDING), ("availableAt", ASCENDING)])
+    jobs.create_index([("status", ASCENDING), ("leaseExpiresAt", ASCENDING)])
+    jobs.create_index([("sroCode", ASCENDING), ("regYear", ASCENDING), ("startDocno", ASCENDING)])
+
+
+def job_id(sro_code, year, start_docno, end_docno):
+    return f"{sro_code}:{int(year)}:{start_docno}-{end_docno}"
+
+
+def aligned_chunks(start_docno, end_docno, job_size=JOB_SIZE):
+    """
+    The job_size-aligned chunks overlapping [start_docno, end_docno], as
+    (chunk start, chunk end) of the full chunk.
+    """
+    chunk_start = (start_docno - 1) // job_size * job_size + 1
+    while chunk_start <= end_docno:
+        yield chunk_start, chunk_start + job_size - 1
+        chunk_start = chunk_start + job_size
+
+
+def enqueue_range(db, sro_doc, year, start_docno, end_docno, job_size=JOB_SIZE):
+    """
+    Queue jobs covering [start_docno, end_docno] of one SRO, a range still
+    missing in the gap index. Each job stops at end_docno; an existing job
+    whose endDocno is lower is extended and, if finished, put back to pending
+    to fetch the new docnos. Done jobs with attempts left are put back to
+    pending from the first missing docno. Returns the number of jobs queued
+    or changed.
+    """
+    now = utcnow()
+    operations = []
+    for chunk_start, chunk_end in aligned_chunks(start_docno, end_docno, job_size):
+        _id = job_id(sro_doc["sro_code"], year, chunk_start, chunk_end)
+        job_end = min(chunk_end, end_docno)
+        # Docnos a finished job already fetched but that are still missing
+        operations.append(UpdateOne(
+            {"_id": _id, "status": DONE, "attempts": {"$lt": MAX_ATTEMPTS}},
+            {"$set": {"status": PENDING, "nextDocno": max(chunk_start, start_docno),
+                      "availableAt": now, "requeuedAt": now},
+             "$unset": {"progress": "", "result": ""}}
+        ))
+        # Docnos issued since a finished job was planned (nextDocno is past the old endDocno)
+        operations.append(UpdateOne(
+            {"_id": _id, "status": {"$in": [DONE, FAILED]}, "endDocno": {"$lt": job_end}},
+            {"$set": {"status": PENDING, "availableAt": now, "requeuedAt": now},
+             "$unset": {"progress": "", "result": "", "lastError": ""}}
+        ))
+        operations.append(UpdateOne(
+            {"_id": _id},
+            {
+                "$setOnInsert": {
+                    "sroCode": sro_doc["sro_code"],
+                    "regYear": int(year),
+                    "district": sro_doc["district"],
+                    "districtCode": sro_doc["districtCode"],
+                    "state": sro_doc["state"],
+                    "sroName": sro_doc["sro_name"],
+                    "startDocno": chunk_start,
+                    "nextDocno": chunk_start,
+                    "status": PENDING,
+                    "attempts": 0,
+                    "availableAt": now,
+                    "createdAt": now,
+                },
+                # Extends the job in place as the frontier moves
+                "$max": {"endDocno": job_end},
+            },
+            upsert=True
+        ))
+    if not operations:
+        return 0
+    # Ordered: the requeues compare against endDocno before it is extended
+    result = db[JOBS_COLLECTION].bulk_write(operations, ordered=True)
+    return result.upserted_count + result.modified_count
+
+
+def plan_missing(db, year):
+    """
+    Queue every missing docno below each SRO's known frontier, from the
+    gap index (sequential start point up to last_doc_number - 1).
+    """
+    indexes = {index["sroCode"]: index for index in get_year_indexes(db, year)}
+    frontiers = {doc["sro_code"]: doc.get("last_doc_number", 1) for doc in db["sro_last_doc_no"].find()}
+
+    queued = 0
+    for sro_doc in db["sro_codes"].find():
+        sro_code = sro_doc["sro_code"]
+        last_docno = max(sro_doc.get("last_doc_number", 1), frontiers.get(sro_code, 1)) - 1
+        index = indexes.get(sro_code)
+        start_docno = sequential_start_point(index) if index else 1
+        for range_start, range_end in missing_ranges(index, start_docno, last_docno):
+            queued += enqueue_range(db, sro_doc, year, range_start, range_end)
+    return queued
+
+
+def claim_job(db, worker_id):
+    """
+    Lease the oldest available job: pending and due, or leased by a worker
+    whose lease expired. Returns the job or None.
+    """
+    now = utcnow()
+    return db[JOBS_COLLECTION].find_one_and_update(
+        {"$or": [
+            {"status": PENDING, "availableAt": {"$lte": now}},
+            {"status": LEASED, "leaseExpiresAt": {"$lt": now}},
+        ]},
+        {"$set": {"status": LEASED, "leaseOwner": worker_id, "leasedAt": now,
+                  "leaseExpiresAt": now + datetime.timedelta(seconds=LEASE_SECONDS)},
+         "$inc": {"attempts": 1}},
+        sort=[("availableAt", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def heartbeat(db, job, worker_id, next_docno, counts):
+    """
+    Renew the lease and checkpoint progress. Returns False if the lease was lost
+    (expired and taken by another worker), in which case the job must be dropped.
+    """
+    now = utcnow()
+    result = db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "status": LEASED, "leaseOwner": worker_id},
+        {"$set": {"leaseExpiresAt": now + datetime.timedelta(seconds=LEASE_SECONDS),
+                  "heartbeatAt": now, "nextDocno": next_docno, "progress": counts}}
+    )
+    return result.matched_count == 1
+
+
+def complete_job(db, job, worker_id, counts):
+    """
+    Mark the job done, or put it back to pending after the fetched docnos if
+    a plan extended its endDocno while it was leased.
+    """
+    now = utcnow()
+    lease = {"_id": job["_id"], "status": LEASED, "leaseOwner": worker_id}
+    result = db[JOBS_COLLECTION].update_one(
+        {**lease, "endDocno": job["endDocno"]},
+        {"$set": {"status": DONE, "nextDocno": job["endDocno"] + 1, "completedAt": now,
+                  "completedBy": worker_id, "result": counts},
+         "$unset": {"leaseExpiresAt": "", "leaseOwner": ""}}
+    )
+    if result.matched_count == 1:
+        return True
+    result = db[JOBS_COLLECTION].update_one(
+        lease,
+        {"$set": {"status": PENDING, "nextDocno": job["endDocno"] + 1, "availableAt": now, "progress": counts},
+         "$unset": {"leaseExpiresAt": "", "leaseOwner": ""}}
+    )
+    return result.matched_count == 1
+
+
+def fail_job(db, job, worker_id, error, next_docno, counts):
+    """
+    Put the job back with a delay, or mark it failed after MAX_ATTEMPTS.
+    """
+    now = utcnow()
+    failed = job["attempts"] >= MAX_ATTEMPTS
+    delay = RETRY_DELAY_SECONDS * 2 ** (job["attempts"] - 1)
+    db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "status": LEASED, "leaseOwner": worker_id},
+        {"$set": {"status": FAILED if failed else PENDING, "nextDocno": next_docno, "progress": counts, "lastError": error,
+                  "availableAt": now + datetime.timedelta(seconds=delay), "failedAt": now},
+         "$unset": {"leaseExpiresAt": "", "leaseOwner": ""}}
+    )
+    return failed
+
+
+def has_data(response_text):
+    """
+    Check if the response contains valid deed data.
+    """
+    no_data_phrase = "Details of the document not found in the Records, contact SRO"
+    return no_data_phrase not in response_text
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def run_job(db, job, worker_id):
+    """
+    Fetch every docno of the job from its checkpoint on, renewing the lease as it goes.
+    """
+    market_collection = db["market-value"]
+    counts = dict(job.get("progress") or {"saved": 0, "empty": 0, "skipped": 0})
+    last_heartbeat = time.monotonic()
+    docno = job["nextDocno"]
+
+    try:
+        while docno <= job["endDocno"]:
+            if time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+                if not heartbeat(db, job, worker_id, docno, counts):
+                    raise LeaseLost(job["_id"])
+                last_heartbeat = time.monotonic()
+
+            if docno in get_bitmap(db, job["sroCode"], job["regYear"]):
+                counts["skipped"] += 1
+                docno += 1
+                continue
+
+            pace(job["sroCode"])
+            response_text = fetch_deed(job["districtCode"], job["sroCode"], docno, job["regYear"])
+            parsed = parse_document(response_text, job["district"], job["districtCode"], job["state"],
+                                    job["sroName"], job["sroCode"], docno) if has_data(response_text) else None
+            if parsed:
+                upsert_deed(market_collection, parsed, job["regYear"])
+                counts["saved"] += 1
+            else:
+                counts["empty"] += 1
+            docno += 1
+    except requests.RequestException as e:
+        failed = fail_job(db, job, worker_id, str(e), docno, counts)
+        print(f"  ❌ [{worker_id}] {job['_id']} at docno {docno}: {e} ({'failed for good' if failed else 'will retry'})")
+        return
+
+    if complete_job(db, job, worker_id, counts):
+        print(f"  ✅ [{worker_id}] {job['_id']}: {counts['saved']} saved, {counts['empty']} empty, {counts['skipped']} already stored")
+
+
+def run_worker(worker_number=0, max_jobs=None):
+    """
+    Worker process: claim and run jobs until max_jobs are done (forever by default).
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_number}"
+    db = MongoClient(MONGO_URI)["mydatabase"]
+    archive_responses(db)
+    done = 0
+    print(f"👷 Worker {worker_id} started")
+    while max_jobs is None or done < max_jobs:
+        job = claim_job(db, worker_id)
+        if job is None:
+            time.sleep(IDLE_SLEEP_SECONDS)
+            continue
+        try:
+            run_job(db, job, worker_id)
+        except LeaseLost:
+            print(f"  ⚠️ [{worker_id}] lease on {job['_id']} expired and was taken over, dropping it")
+        done += 1
+    print(f"🌐 [{worker_id}] {get_client().summary()}, {get_pacer().summary()}")
+
+
+def run_workers(workers, max_jobs=None):
+    # Each process needs its own MongoClient and HTTP session, so start them fresh
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(number, max_jobs)) for number in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def print_status(db):
+    pipeline = [
+        {"$group": {"_id": {"sroCode": "$sroCode", "regYear": "$regYear", "status": "$status"},
+                    "jobs": {"$sum": 1}, "docnos": {"$sum": {"$add": [{"$subtract": ["$endDocno", "$startDocno"]}, 1]}}}},
+        {"$sort": {"_id.regYear": 1, "_id.sroCode": 1}}
+    ]
+    rows = {}
+    for group in db[JOBS_COLLECTION].aggregate(pipeline):
+        key = (group["_id"]["regYear"], group["_id"]["sroCode"])
+        rows.setdefault(key, {})[group["_id"]["status"]] = group["jobs"]
+
+    print(f"{'Year':<6} {'SRO Code':<10} {PENDING:>8} {LEASED:>8} {DONE:>8} {FAILED:>8}")
+    print("=" * 52)
+    totals = {}
+    for (year, sro_code), statuses in rows.items():
+        print(f"{year:<6} {sro_code:<10} " + " ".join(f"{statuses.get(status, 0):>8}" for status in (PENDING, LEASED, DONE, FAILED)))
+        for status, jobs in statuses.items():
+            totals[status] = totals.get(status, 0) + jobs
+    print("=" * 52)
+    print(f"{'TOTAL':<17} " + " ".join(f"{totals.get(status, 0):>8}" for status in (PENDING, LEASED, DONE, FAILED)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mongo-backed scrape job queue")
+    parser.add_argument("--plan", action="store_true", help="queue jobs for every missing docno below the SRO frontiers")
+    parser.add_argument("--year", type=int, default=datetime.datetime.now().year, help="registration year to plan (default: current)")
+    parser.add_argument("--work", action="store_true", help="run worker processes")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes to run with --work")
+    parser.add_argument("--max-jobs", type=int, help="jobs per worker before it exits (default: run forever)")
+    parser.add_argument("--status", action="store_true", help="show job counts per SRO and status")
+    args = parser.parse_args()
+
+    db = MongoClient(MONGO_URI)["mydatabase"]
+    ensure_job_indexes(db)
+    if args.plan:
+        print(f"📋 Queued {plan_missing(db, args.year)} new jobs for {args.year}")
+    if args.work:
+        run_workers(args.workers, args.max_jobs)
+    if args.status or not (args.plan or args.work):
+        print_status(db)
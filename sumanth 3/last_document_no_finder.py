@@ -1,8 +1,13 @@
 from pymongo import MongoClient
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import datetime
 import time
 
+from deed_parser import find_deed_table
+from http_client import fetch_deed
+from pacing import get_pacer, pace
+from response_archive import archive_responses
+
 # -------------------------
 # MongoDB setup
 # -------------------------
@@ -12,6 +17,26 @@ db = client["mydatabase"]
 sro_collection = db["sro_codes"]                # source collection
 sro_lastdoc_collection = db["sro_last_doc_no"]  # existing collection to update
 
+# -------------------------
+# Frontier search settings
+# -------------------------
+# The frontier only moves forward, so the search starts from the stored
+# last_doc_number instead of bisecting 1..100000 every run. The first probe is
+# where the SRO is expected to be by now (docs_per_day x days since the last
+# run), then it gallops away from that guess in growing steps and bisects the
+# last step. The first step is how far off that guess usually is: docs_per_day_error
+# is the smoothed relative error of past guesses of the SRO. A miss followed by
+# data within GAP_PROBES docnos is an isolated gap (cancelled or withheld
+# document), not the end.
+#
+# Cost is the hit, the miss after it and the GAP_PROBES checks (4 requests) when
+# the guess is exact, plus about log2 of the guess error in docnos: ~5 for SROs
+# with a steady rate, 7-9 when the rate swings by tens of percent between runs.
+GAP_PROBES = 2              # docnos checked after the last miss before calling it the frontier
+GALLOP_DIVISOR = 8          # first gallop step = expected advance / GALLOP_DIVISOR until the error is known
+RATE_SMOOTHING = 0.5        # weight of the latest run in the stored docs_per_day and docs_per_day_error
+MIN_ELAPSED_DAYS = 1 / 24   # don't extrapolate a rate from runs minutes apart
+
 # -------------------------
 # Utils
 # -------------------------
@@ -20,80 +45,179 @@ def has_data(response_text):
     no_data_phrase = "Details of the document not found in the Records, contact SRO"
     return no_data_phrase not in response_text
 
-def parse_document(html_text):
-    """Quick check to ensure table is valid (no need full parse)."""
-    soup = BeautifulSoup(html_text, "html.parser")
-    return bool(soup.find("table", {"class": "table"}))
-
-def is_valid_doc(districtCode, sro_code, docno, headers, cookies):
+def is_valid_doc(districtCode, sro_code, docno, year):
     """Check if a document exists."""
-    url = "https://registration.telangana.gov.in/getDeedDetails.htm"
-    payload = {
-        "deedsel": "1",
-        "districtCode": districtCode,
-        "sroCode": sro_code,
-        "doctno": str(docno),
-        "regyear": "2025",
-    }
-    response = requests.post(url, headers=headers, cookies=cookies, data=payload)
-    return has_data(response.text) and parse_document(response.text)
+    pace(sro_code)
+    response_text = fetch_deed(districtCode, sro_code, docno, year)
+    return has_data(response_text) and find_deed_table(response_text) is not None
+
+
+class FrontierSearch:
+    """
+    Finds the highest docno with data for one SRO and year. Every docno is
+    requested at most once per search; `requests` counts them.
+    """
+
+    def __init__(self, districtCode, sro_code, year):
+        self.districtCode = districtCode
+        self.sro_code = sro_code
+        self.year = year
+        self.probes = {}
+
+    @property
+    def requests(self):
+        return len(self.probes)
+
+    def exists(self, docno):
+        if docno < 1:
+            return True     # lower sentinel: "no document yet"
+        if docno not in self.probes:
+            self.probes[docno] = is_valid_doc(self.districtCode, self.sro_code, docno, self.year)
+        return self.probes[docno]
+
+    def next_after_gap(self, docno):
+        """
+        First docno with data among the GAP_PROBES after a missing one, or None.
+        """
+        for candidate in range(docno + 1, docno + 1 + GAP_PROBES):
+            if self.exists(candidate):
+                return candidate
+        return None
+
+    def find(self, last_valid, expected=1, spread=None):
+        """
+        Highest docno with data, given one known to have data (0 if none), how
+        far the frontier is expected to have moved since and how far off that
+        expectation typically is (default: expected / GALLOP_DIVISOR).
+        """
+        low = last_valid
+        guess = low + max(1, expected)
+        step = max(1, round(spread if spread is not None else expected / GALLOP_DIVISOR))
+        initial_step = step
+
+        if self.exists(guess):
+            # Gallop forward from the guess until a miss
+            low = guess
+            while self.exists(low + step):
+                low += step
+                step *= 2
+            high = low + step
+        else:
+            # Gallop back from the guess until a hit (or the known docno)
+            high = guess
+            while high - step > low and not self.exists(high - step):
+                high -= step
+                step *= 2
+            low = max(low, high - step)
+
+        # low has data, high does not
+        while high - low > 1:
+            mid = (low + high) // 2
+            if self.exists(mid):
+                low = mid
+            else:
+                high = mid
+
+        resumed = self.next_after_gap(high)
+        if resumed is not None:
+            # Only a gap: search on towards the original guess with the same spread
+            return self.find(resumed, guess - resumed, initial_step)
+        return low
+
+
+def expected_advance(lastdoc, now_millis, year):
+    """
+    Last docno known to have data, how many new ones to expect since then and
+    how far off that typically is (None if not known yet), from the stored
+    last_doc_number (the next docno to fetch), docs_per_day and docs_per_day_error.
+    """
+    if not lastdoc or not lastdoc.get("last_update_time"):
+        return 0, 1, None
+    updated = datetime.datetime.fromtimestamp(lastdoc["last_update_time"] / 1000)
+    if updated.year != year:
+        return 0, 1, None   # docnos restart every year
+
+    last_valid = max(0, lastdoc.get("last_doc_number", 1) - 1)
+    days = max(MIN_ELAPSED_DAYS, (now_millis - lastdoc["last_update_time"]) / 86400000)
+    rate = lastdoc.get("docs_per_day")
+    if not rate:
+        return last_valid, 1, None
+    expected = max(1, round(rate * days))
+    error = lastdoc.get("docs_per_day_error")
+    return last_valid, expected, expected * error if error is not None else None
+
+
+def update_error(lastdoc, expected, last_valid, found):
+    """
+    Smoothed relative error of the expected advance after this run, None if
+    there was no rate to make a guess from.
+    """
+    if not lastdoc or not lastdoc.get("docs_per_day") or not last_valid or found < last_valid:
+        return lastdoc.get("docs_per_day_error") if lastdoc else None     # nothing was extrapolated
+    error = abs((found - last_valid) - expected) / expected
+    previous = lastdoc.get("docs_per_day_error")
+    return error if previous is None else RATE_SMOOTHING * error + (1 - RATE_SMOOTHING) * previous
+
+
+def update_rate(lastdoc, last_valid, found, now_millis):
+    """
+    Smoothed docs/day after this run, None if it cannot be measured yet.
+    """
+    if not lastdoc or not lastdoc.get("last_update_time") or found < last_valid:
+        return lastdoc.get("docs_per_day") if lastdoc else None
+    days = max(MIN_ELAPSED_DAYS, (now_millis - lastdoc["last_update_time"]) / 86400000)
+    rate = (found - last_valid) / days
+    previous = lastdoc.get("docs_per_day")
+    return rate if previous is None else RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * previous
 
 # -------------------------
-# Main execution with binary search
+# Main execution with galloping search
 # -------------------------
-def find_last_docno_for_sros_binary_search():
-    headers = {
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Origin": "https://registration.telangana.gov.in",
-        "Referer": "https://registration.telangana.gov.in/districtList.htm",
-        "User-Agent": "Mozilla/5.0",
-    }
-    cookies = {
-        "JSESSIONID": "Dfs0yvPTGSkt1pmP7g3PhJWpCD885yvK22LKLHL0g66ppvJdQtS8!-490224720!1756303182069"
-    }
-
-    MAX_DOCNO = 100000  # upper limit for binary search
-
-    for sro_doc in sro_collection.find():
+def find_last_docno_for_sros(year=None, sro_codes=None):
+    year = year or datetime.datetime.now().year
+    query = {"sro_code": {"$in": sro_codes}} if sro_codes else {}
+    total_requests = 0
+
+    for sro_doc in sro_collection.find(query):
         district = sro_doc["district"]
         districtCode = sro_doc["districtCode"]
         sro_name = sro_doc["sro_name"]
         sro_code = sro_doc["sro_code"]
 
-        print(f"\n📌 Checking last docno for {district} {districtCode} - {sro_name} ({sro_code})")
+        lastdoc = sro_lastdoc_collection.find_one({"sro_code": sro_code})
+        if not lastdoc:
+            print(f"⚠️ SRO {sro_code} not found in 'sro_last_doc_no'. Skipped.")
+            continue
 
-        low, high = 1, MAX_DOCNO
-        last_valid_docno = 0
+        now_millis = int(time.time() * 1000)
+        last_valid, expected, spread = expected_advance(lastdoc, now_millis, year)
+        print(f"\n📌 Checking last docno for {district} {districtCode} - {sro_name} ({sro_code}) from {last_valid}, expecting ~{expected} new")
 
-        while low <= high:
-            mid = (low + high) // 2
-            if is_valid_doc(districtCode, sro_code, mid, headers, cookies):
-                last_valid_docno = mid
-                low = mid + 1  # try higher
-            else:
-                high = mid - 1  # try lower
+        search = FrontierSearch(districtCode, sro_code, year)
+        last_valid_docno = search.find(last_valid, expected, spread)
+        total_requests += search.requests
 
         # store next doc number
         next_docno = last_valid_docno + 1
-        now_millis = int(time.time() * 1000)
+        update = {"last_doc_number": next_docno, "last_update_time": now_millis}
+        rate = update_rate(lastdoc, last_valid, last_valid_docno, now_millis)
+        if rate is not None:
+            update["docs_per_day"] = rate
+        error = update_error(lastdoc, expected, last_valid, last_valid_docno)
+        if error is not None:
+            update["docs_per_day_error"] = error
 
-        result = sro_lastdoc_collection.update_one(
-            {"sro_code": sro_code},  # only update existing
-            {
-                "$set": {
-                    "last_doc_number": next_docno,
-                    "last_update_time": now_millis,
-                }
-            }
-        )
-        print(f"\n ✅ Done for {district} {districtCode} - {sro_name} ({sro_code})")
-
-        if result.matched_count:
-            print(f"📌 Updated {sro_code} → last_doc_number={next_docno}")
-        else:
-            print(f"⚠️ SRO {sro_code} not found in 'sro_last_doc_no'. Skipped.")
+        sro_lastdoc_collection.update_one({"sro_code": sro_code}, {"$set": update})
+        print(f"📌 Updated {sro_code} → last_doc_number={next_docno} ({search.requests} requests)")
+
+    print(f"\n🌐 {total_requests} requests in total, {get_pacer().summary()}")
 
 if __name__ == "__main__":
-    find_last_docno_for_sros_binary_search()
-    print("\n🎯 Completed! Updated 'sro_last_doc_no' collection using binary search.")
+    parser = argparse.ArgumentParser(description="Find the last document number of every SRO")
+    parser.add_argument("--year", type=int, help="registration year (default: current year)")
+    parser.add_argument("--sro", nargs="*", help="only these sro_codes (default: all in sro_codes)")
+    args = parser.parse_args()
+
+    archive_responses(db)
+    find_last_docno_for_sros(args.year, args.sro)
+    print("\n🎯 Completed! Updated 'sro_last_doc_no' collection using galloping search.")
@@ -0,0 +1,171 @@
+import threading
+import time
+
+from http_client import get_client
+
+# -------------------------
+# Adaptive request pacing (AIMD)
+# -------------------------
+# Instead of fixed sleeps between requests, scrapers wait on a Pacer whose
+# request rates follow how the registration server is responding, the way TCP
+# sizes its congestion window:
+#
+#   healthy response  rate += ADDITIVE_INCREASE / rate   (+ADDITIVE_INCREASE req/s
+#                     per second of healthy traffic)
+#   timeout, 5xx,     rate *= DECREASE_FACTOR, at most once per DECREASE_COOLDOWN
+#   connection error, so a burst of requests that failed together only
+#   expired session   backs off once
+#
+# A response is healthy when it came back in under LATENCY_TARGET seconds and
+# the smoothed error rate is under ERROR_RATE_TARGET; slow responses keep the
+# rate where it is. There is one rate for the whole process and one per SRO,
+# and a request waits for both. Outcomes come from the DeedClient listeners, so
+# every request made through http_client feeds the rates, retries included.
+# Pacer.metrics() is the current state; sro_coordinator stores it in each
+# node's heartbeat.
+INITIAL_RATE = 1.0          # requests per second across all SROs
+MAX_RATE = 8.0
+SRO_INITIAL_RATE = 0.5      # what the serial scrapers did with their sleeps
+SRO_MAX_RATE = 2.0
+MIN_RATE = 0.1
+
+ADDITIVE_INCREASE = 0.05    # req/s gained per second of healthy traffic
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 5.0     # seconds
+LATENCY_TARGET = 3.0        # seconds
+ERROR_RATE_TARGET = 0.05
+SMOOTHING = 0.1             # weight of the latest response in the error rate / latency averages
+
+BACKOFF_OUTCOMES = {"timeout", "server_error", "connection_error", "session_expired"}
+
+
+class AimdRate:
+    """
+    One additive-increase / multiplicative-decrease request rate. Not locked,
+    Pacer serializes access.
+    """
+
+    def __init__(self, rate, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.error_rate = 0.0
+        self.latency = None
+        self.last_decrease = float("-inf")
+        self.decreases = 0
+
+    def observe(self, elapsed, outcome, now):
+        failed = outcome in BACKOFF_OUTCOMES
+        self.error_rate = SMOOTHING * failed + (1 - SMOOTHING) * self.error_rate
+
+        if failed:
+            if now - self.last_decrease >= DECREASE_COOLDOWN:
+                self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+                self.last_decrease = now
+                self.decreases += 1
+        elif outcome == "ok":
+            self.latency = elapsed if self.latency is None else SMOOTHING * elapsed + (1 - SMOOTHING) * self.latency
+            if elapsed < LATENCY_TARGET and self.error_rate < ERROR_RATE_TARGET:
+                self.rate = min(self.max_rate, self.rate + ADDITIVE_INCREASE / self.rate)
+
+    def set_max_rate(self, max_rate):
+        self.max_rate = max(self.min_rate, max_rate)
+        self.rate = min(self.rate, self.max_rate)
+
+    def metrics(self):
+        return {
+            "rate": round(self.rate, 3),
+            "maxRate": self.max_rate,
+            "errorRate": round(self.error_rate, 3),
+            "latencyMs": round(self.latency * 1000) if self.latency is not None else None,
+            "decreases": self.decreases,
+        }
+
+
+class Pacer:
+    def __init__(self, rate=INITIAL_RATE, max_rate=MAX_RATE, sro_rate=SRO_INITIAL_RATE, sro_max_rate=SRO_MAX_RATE):
+        self.lock = threading.Lock()
+        self.global_rate = AimdRate(rate, MIN_RATE, max_rate)
+        self.sro_rate = sro_rate
+        self.sro_max_rate = sro_max_rate
+        self.sro_rates = {}         # sro_code -> AimdRate
+        self.next_send = 0.0        # monotonic time the next request may go out
+        self.sro_next_send = {}     # sro_code -> same, per SRO
+
+    def _sro(self, sro_code):
+        if sro_code not in self.sro_rates:
+            self.sro_rates[sro_code] = AimdRate(self.sro_rate, MIN_RATE, self.sro_max_rate)
+        return self.sro_rates[sro_code]
+
+    def rate_for(self, sro_code):
+        """
+        The AimdRate of one SRO (async_scraper's token buckets follow it).
+        """
+        with self.lock:
+            return self._sro(sro_code)
+
+    def set_max_rate(self, max_rate):
+        with self.lock:
+            self.global_rate.set_max_rate(max_rate)
+
+    def observe(self, elapsed, outcome, sro_code=None):
+        """
+        DeedClient listener.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.global_rate.observe(elapsed, outcome, now)
+            if sro_code is not None:
+                self._sro(sro_code).observe(elapsed, outcome, now)
+
+    def wait(self, sro_code=None):
+        """
+        Block until a request for sro_code may be sent under both the global and
+        the SRO rate. Returns the seconds waited.
+        """
+        with self.lock:
+            now = time.monotonic()
+            send_at = max(now, self.next_send)
+            self.next_send = send_at + 1 / self.global_rate.rate
+            if sro_code is not None:
+                send_at = max(send_at, self.sro_next_send.get(sro_code, 0.0))
+                self.sro_next_send[sro_code] = send_at + 1 / self._sro(sro_code).rate
+        delay = send_at - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def metrics(self):
+        with self.lock:
+            return {"global": self.global_rate.metrics(),
+                    "sros": {sro_code: rate.metrics() for sro_code, rate in sorted(self.sro_rates.items())}}
+
+    def summary(self):
+        with self.lock:
+            rates = [rate.rate for rate in self.sro_rates.values()]
+            sro_part = f", per SRO {min(rates):.2f}-{max(rates):.2f} req/s" if rates else ""
+            return (f"pacing at {self.global_rate.rate:.2f} req/s{sro_part}, "
+                    f"{self.global_rate.decreases} backoffs, error rate {self.global_rate.error_rate:.1%}")
+
+
+_default_pacer = None
+_default_pacer_lock = threading.Lock()
+
+
+def get_pacer():
+    """
+    The process-wide pacer, fed by the shared HTTP client.
+    """
+    global _default_pacer
+    with _default_pacer_lock:
+        if _default_pacer is None:
+            _default_pacer = Pacer()
+            get_client().listeners.append(_default_pacer.observe)
+        return _default_pacer
+
+
+def pace(sro_code=None):
+    """
+    wait() on the process-wide pacer; call before every request.
+    """
+    return get_pacer().wait(sro_code)
@@ -0,0 +1,186 @@
+import argparse
+import hashlib
+import time
+import zlib
+
+import gridfs
+from gridfs.errors import FileExists
+from pymongo import ASCENDING, MongoClient
+
+from deed_parser import parse_document
+from deed_store import upsert_operation
+from docno_bitmap import rebuild_bitmaps
+from gap_index import rebuild_gap_index
+from http_client import NO_DATA_PHRASE, get_client
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, fall back to zlib
+    zstandard = None
+
+# -------------------------
+# Raw getDeedDetails response archive
+# -------------------------
+# Every fetched page is kept so market-value can be rebuilt with a better parser
+# without going back to the registration site. Pages are compressed (zstd when
+# the zstandard package is installed, zlib otherwise; ~7x either way) and
+# stored once per distinct content in the raw-responses GridFS bucket, with the
+# sha256 of the uncompressed page as file _id and name (concurrent uploads of the
+# same page collide on the _id instead of storing it twice). raw-response-index maps each
+# (SRO, year, docno) to the sha256 of the latest page fetched for it.
+#
+#   python response_archive.py --stats
+#   python response_archive.py --reparse [--sro 1524] [--year 2025]
+BUCKET_NAME = "raw-responses"
+INDEX_COLLECTION = "raw-response-index"
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+REPARSE_BATCH_SIZE = 1000
+
+
+def compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(codec, data):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This response was archived with zstd; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def entry_id(sro_code, year, docno):
+    return f"{sro_code}:{int(year)}:{int(docno)}"
+
+
+class ResponseArchive:
+    def __init__(self, db):
+        self.db = db
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=BUCKET_NAME)
+        self.files = db[f"{BUCKET_NAME}.files"]
+        self.index = db[INDEX_COLLECTION]
+
+    def ensure_indexes(self):
+        self.files.create_index([("filename", ASCENDING)])
+        self.index.create_index([("sroCode", ASCENDING), ("regYear", ASCENDING), ("docno", ASCENDING)])
+
+    def store(self, district_code, sro_code, docno, year, response_text):
+        """
+        Archive one fetched page (DeedClient.archive hook). Returns its sha256.
+        """
+        data = response_text.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        if self.files.count_documents({"_id": sha256}, limit=1) == 0:
+            codec, compressed = compress(data)
+            try:
+                self.bucket.upload_from_stream_with_id(sha256, sha256, compressed, metadata={"codec": codec, "size": len(data)})
+            except FileExists:
+                pass    # another scraper stored the same page in the meantime
+
+        self.index.update_one(
+            {"_id": entry_id(sro_code, year, docno)},
+            {"$set": {"sroCode": sro_code, "districtCode": district_code, "regYear": int(year), "docno": int(docno),
+                      "sha256": sha256, "hasData": NO_DATA_PHRASE not in response_text,
+                      "fetchedAt": int(time.time() * 1000)}},
+            upsert=True
+        )
+        return sha256
+
+    def load(self, sha256):
+        """
+        The uncompressed page stored under sha256.
+        """
+        grid_out = self.bucket.open_download_stream(sha256)
+        return decompress(grid_out.metadata["codec"], grid_out.read()).decode("utf-8")
+
+    def get(self, sro_code, year, docno):
+        entry = self.index.find_one({"_id": entry_id(sro_code, year, docno)})
+        return self.load(entry["sha256"]) if entry else None
+
+    def stats(self):
+        pipeline = [{"$group": {"_id": None, "pages": {"$sum": 1}, "size": {"$sum": "$metadata.size"},
+                                "stored": {"$sum": "$length"}}}]
+        totals = next(self.files.aggregate(pipeline), {"pages": 0, "size": 0, "stored": 0})
+        return {"responses": self.index.estimated_document_count(), "distinct": totals["pages"],
+                "size": totals["size"], "stored": totals["stored"]}
+
+
+def archive_responses(db):
+    """
+    Archive every page the shared HTTP client fetches from now on.
+    """
+    archive = ResponseArchive(db)
+    archive.ensure_indexes()
+    get_client().archive = archive.store
+    return archive
+
+
+def reparse(db, sro_code=None, year=None, batch_size=REPARSE_BATCH_SIZE):
+    """
+    Rebuild market-value documents from archived pages with the current parser,
+    then rebuild the gap indexes and bitmaps they feed. Returns (pages, deeds).
+    """
+    archive = ResponseArchive(db)
+    market_collection = db["market-value"]
+    sro_docs = {sro_doc["sro_code"]: sro_doc for sro_doc in db["sro_codes"].find()}
+
+    query = {"hasData": True}
+    if sro_code:
+        query["sroCode"] = sro_code
+    if year:
+        query["regYear"] = int(year)
+
+    pages = deeds = 0
+    batch = []
+    for entry in archive.index.find(query).sort([("sroCode", 1), ("regYear", 1), ("docno", 1)]):
+        sro_doc = sro_docs.get(entry["sroCode"])
+        if sro_doc is None:
+            continue
+        pages += 1
+        parsed = parse_document(archive.load(entry["sha256"]), sro_doc["district"], sro_doc["districtCode"],
+                                sro_doc["state"], sro_doc["sro_name"], entry["sroCode"], entry["docno"])
+        if not parsed:
+            continue
+        # New deeds get the time the page was fetched, not the time of the reparse
+        parsed["creationTime"] = entry["fetchedAt"]
+        batch.append(upsert_operation(parsed, entry["regYear"]))
+        if len(batch) >= batch_size:
+            market_collection.bulk_write(batch, ordered=False)
+            deeds += len(batch)
+            batch = []
+            print(f"  {deeds:,} deeds rewritten")
+    if batch:
+        market_collection.bulk_write(batch, ordered=False)
+        deeds += len(batch)
+
+    rebuild_gap_index(db, sro_code, year)
+    rebuild_bitmaps(db, sro_code, year)
+    return pages, deeds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive of raw getDeedDetails responses")
+    parser.add_argument("--reparse", action="store_true", help="rebuild market-value from the archived pages")
+    parser.add_argument("--sro", help="only this sro_code")
+    parser.add_argument("--year", type=int, help="only this registration year")
+    parser.add_argument("--stats", action="store_true", help="show archive size")
+    args = parser.parse_args()
+
+    db = MongoClient("mongodb://localhost:27017/")["mydatabase"]
+    if args.reparse:
+        started = time.perf_counter()
+        pages, deeds = reparse(db, args.sro, args.year)
+        elapsed = time.perf_counter() - started
+        print(f"✅ Reparsed {pages:,} pages into {deeds:,} deeds in {elapsed:.1f}s ({pages / elapsed if elapsed else 0:,.0f} pages/s)")
+    if args.stats or not args.reparse:
+        stats = ResponseArchive(db).stats()
+        ratio = stats["size"] / stats["stored"] if stats["stored"] else 0
+        print(f"📦 {stats['responses']:,} responses, {stats['distinct']:,} distinct pages, "
+              f"{stats['size'] / 2 ** 20:,.1f} MB raw in {stats['stored'] / 2 ** 20:,.1f} MB ({ratio:.1f}x), "
+              f"codec for new pages: {'zstd' if zstandard else 'zlib'}")
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import datetime
+import math
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import UpdateOne
+
+from async_scraper import DEFAULT_BURST, DEFAULT_RATE, PER_SRO_CONCURRENCY, SroCrawl, TokenBucket
+from http_client import POOL_SIZE, get_client
+from main import db, sro_collection
+from pacing import get_pacer
+from response_archive import archive_responses
+
+# -------------------------
+# Multi-node scraping: SROs are sharded across nodes with expiring leases
+# -------------------------
+# Every node runs this script. Each SRO in sro_codes has a lease document in
+# sro-leases; a node crawls only the SROs it holds a live lease on (with the
+# async_scraper crawler and its own politeness budget) and renews its leases
+# every HEARTBEAT_SECONDS. Each node also keeps a heartbeat in scraper-nodes;
+# from the number of live nodes it works out its fair share of SROs, takes
+# free or expired leases up to it and hands back any excess, so when a node
+# dies its SROs are picked up by the others within LEASE_SECONDS, and a new
+# node gets a share of the SROs on its first rounds.
+#
+#   python sro_coordinator.py            run a node
+#   python sro_coordinator.py --status   progress of all nodes and SROs
+NODES_COLLECTION = "scraper-nodes"
+LEASES_COLLECTION = "sro-leases"
+
+HEARTBEAT_SECONDS = 15
+LEASE_SECONDS = 60              # a node that missed ~4 heartbeats is considered dead
+RECRAWL_INTERVAL_SECONDS = 300  # pause after an SRO crawl reached its frontier
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class ScraperNode:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, per_sro=PER_SRO_CONCURRENCY,
+                 recrawl_interval=RECRAWL_INTERVAL_SECONDS):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.bucket = None
+        self.rate = rate
+        self.burst = burst
+        self.per_sro = per_sro
+        self.recrawl_interval = recrawl_interval
+        self.year = datetime.datetime.now().year
+        self.sro_codes = []
+        self.crawls = {}        # sro_code -> asyncio.Task
+        self.saved = 0
+        self.started = utcnow()
+
+    # ---- Mongo side (blocking, run in threads) ----
+
+    def heartbeat(self):
+        now = utcnow()
+        db[NODES_COLLECTION].update_one(
+            {"_id": self.node_id},
+            {"$set": {"host": socket.gethostname(), "pid": os.getpid(), "startedAt": self.started,
+                      "heartbeatAt": now, "leaseExpiresAt": now + datetime.timedelta(seconds=LEASE_SECONDS),
+                      "sros": sorted(self.crawls), "saved": self.saved, "http": get_client().summary(),
+                      "pacing": get_pacer().metrics(),
+                      "stopped": False}},
+            upsert=True
+        )
+
+    def ensure_leases(self):
+        """
+        One lease document per SRO in sro_codes.
+        """
+        self.sro_codes = [sro_doc["sro_code"] for sro_doc in sro_collection.find({}, {"sro_code": 1})]
+        operations = [UpdateOne({"_id": sro_code},
+                                {"$setOnInsert": {"owner": None, "leaseExpiresAt": datetime.datetime(1970, 1, 1), "saved": 0}},
+                                upsert=True)
+                      for sro_code in self.sro_codes]
+        if operations:
+            db[LEASES_COLLECTION].bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def fair_share(self, sro_count):
+        live_nodes = db[NODES_COLLECTION].count_documents({"leaseExpiresAt": {"$gt": utcnow()}, "stopped": False})
+        return math.ceil(sro_count / max(1, live_nodes))
+
+    def renew(self):
+        """
+        Extend all leases this node holds. Returns the sro_codes still held.
+        """
+        now = utcnow()
+        db[LEASES_COLLECTION].update_many(
+            {"owner": self.node_id, "leaseExpiresAt": {"$gt": now}},
+            {"$set": {"leaseExpiresAt": now + datetime.timedelta(seconds=LEASE_SECONDS)}}
+        )
+        return {lease["_id"] for lease in db[LEASES_COLLECTION].find({"owner": self.node_id, "leaseExpiresAt": {"$gt": now}}, {"_id": 1})}
+
+    def acquire(self, count):
+        """
+        Take up to count free or expired SRO leases. Returns the sro_codes taken.
+        """
+        acquired = []
+        for _ in range(count):
+            now = utcnow()
+            lease = db[LEASES_COLLECTION].find_one_and_update(
+                {"_id": {"$in": self.sro_codes}, "$or": [{"owner": None}, {"leaseExpiresAt": {"$lt": now}}]},
+                {"$set": {"owner": self.node_id, "acquiredAt": now,
+                          "leaseExpiresAt": now + datetime.timedelta(seconds=LEASE_SECONDS)}},
+                sort=[("leaseExpiresAt", 1)]
+            )
+            if lease is None:
+                break
+            acquired.append(lease["_id"])
+        return acquired
+
+    def release(self, sro_codes):
+        db[LEASES_COLLECTION].update_many(
+            {"_id": {"$in": list(sro_codes)}, "owner": self.node_id},
+            {"$set": {"owner": None, "leaseExpiresAt": datetime.datetime(1970, 1, 1), "releasedAt": utcnow()}}
+        )
+
+    def record_crawl(self, sro_code, crawl, saved):
+        db[LEASES_COLLECTION].update_one(
+            {"_id": sro_code},
+            {"$inc": {"saved": saved},
+             "$set": {"lastCrawlAt": utcnow(), "lastCrawlBy": self.node_id, "checkedUpTo": crawl.frontier - 1}}
+        )
+
+    def shutdown(self):
+        self.release(self.crawls)
+        db[NODES_COLLECTION].update_one({"_id": self.node_id}, {"$set": {"stopped": True, "sros": []}})
+
+    # ---- Crawling ----
+
+    async def crawl_sro(self, sro_code):
+        """
+        Crawl one SRO to its frontier, wait, repeat, until the lease is lost.
+        """
+        while True:
+            sro_doc = await asyncio.to_thread(sro_collection.find_one, {"sro_code": sro_code})
+            crawl = SroCrawl(sro_doc, self.year, self.bucket, self.per_sro)
+            saved = await crawl.run()
+            self.saved += saved
+            await asyncio.to_thread(self.record_crawl, sro_code, crawl, saved)
+            await asyncio.sleep(self.recrawl_interval)
+
+    def stop_crawl(self, sro_code):
+        task = self.crawls.pop(sro_code, None)
+        if task:
+            task.cancel()
+
+    async def rebalance(self, sro_count):
+        held = await asyncio.to_thread(self.renew)
+        for sro_code in list(self.crawls):
+            if sro_code not in held:
+                print(f"⚠️ Lost the lease on {sro_code}, stopping its crawl")
+                self.stop_crawl(sro_code)
+
+        share = await asyncio.to_thread(self.fair_share, sro_count)
+        if len(held) > share:
+            excess = sorted(held)[share:]
+            for sro_code in excess:
+                self.stop_crawl(sro_code)
+            await asyncio.to_thread(self.release, excess)
+            held -= set(excess)
+            print(f"↩️ Handed back {len(excess)} SROs (fair share is {share})")
+        elif len(held) < share:
+            acquired = await asyncio.to_thread(self.acquire, share - len(held))
+            held |= set(acquired)
+            if acquired:
+                print(f"➕ Took {', '.join(acquired)} (fair share is {share})")
+
+        # (Re)start crawls of held SROs, including ones whose crawl died with an error
+        for sro_code in held:
+            if sro_code not in self.crawls or self.crawls[sro_code].done():
+                self.crawls[sro_code] = asyncio.create_task(self.crawl_sro(sro_code))
+
+    async def run(self):
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=POOL_SIZE))
+        pacer = get_pacer()
+        pacer.set_max_rate(self.rate)
+        self.bucket = TokenBucket(self.rate, self.burst, pacer.global_rate)
+        sro_count = await asyncio.to_thread(self.ensure_leases)
+        print(f"🛰️ Node {self.node_id} joining, {sro_count} SROs in sro_codes")
+        try:
+            while True:
+                await asyncio.to_thread(self.heartbeat)
+                await self.rebalance(sro_count)
+                await asyncio.sleep(HEARTBEAT_SECONDS)
+        finally:
+            for sro_code in list(self.crawls):
+                self.stop_crawl(sro_code)
+            await asyncio.to_thread(self.shutdown)
+            print(f"👋 Node {self.node_id} left, {self.saved} documents saved")
+
+
+def print_status():
+    now = utcnow()
+    print(f"{'Node':<32} {'State':<8} {'SROs':>5} {'Saved':>8} {'Req/s':>6}  HTTP")
+    print("=" * 100)
+    for node in db[NODES_COLLECTION].find().sort("_id", 1):
+        state = "stopped" if node.get("stopped") else ("live" if node["leaseExpiresAt"] > now else "dead")
+        rate = node.get("pacing", {}).get("global", {}).get("rate", "-")
+        print(f"{node['_id']:<32} {state:<8} {len(node.get('sros', [])):>5} {node.get('saved', 0):>8} {rate:>6}  {node.get('http', '')}")
+
+    last_docs = {doc["sro_code"]: doc.get("last_doc_number", 1) for doc in sro_collection.find()}
+    print(f"\n{'SRO Code':<10} {'Owner':<32} {'Saved':>8} {'Checked to':>11} {'Last flag':>10}  Last crawl")
+    print("=" * 100)
+    total_saved = 0
+    unowned = 0
+    for lease in db[LEASES_COLLECTION].find().sort("_id", 1):
+        owner = lease["owner"] if lease.get("owner") and lease["leaseExpiresAt"] > now else "-"
+        unowned += owner == "-"
+        total_saved += lease.get("saved", 0)
+        print(f"{lease['_id']:<10} {owner:<32} {lease.get('saved', 0):>8} {lease.get('checkedUpTo', '-'):>11} "
+              f"{last_docs.get(lease['_id'], '-'):>10}  {lease.get('lastCrawlAt', '-')}")
+    print("=" * 100)
+    print(f"TOTAL: {total_saved:,} documents saved, {unowned} SROs without a live owner")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl SROs on several machines, sharded with leases in MongoDB")
+    parser.add_argument("--status", action="store_true", help="show nodes, SRO owners and progress, then exit")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="maximum requests per second of this node")
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST, help="token bucket capacity")
+    parser.add_argument("--per-sro", type=int, default=PER_SRO_CONCURRENCY, help="requests in flight per SRO")
+    parser.add_argument("--recrawl-interval", type=float, default=RECRAWL_INTERVAL_SECONDS, help="seconds between crawls of an SRO")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+    else:
+        archive_responses(db)
+        node = ScraperNode(args.rate, args.burst, args.per_sro, args.recrawl_interval)
+        try:
+            asyncio.run(node.run())
+        except KeyboardInterrupt:
+            print("\nStopped.")
@@ -1,85 +1,491 @@
+import argparse
+import multiprocessing
+import os
 import re
-from pymongo import MongoClient
+import time
+from collections import Counter
 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["mydatabase"]  # replace with your DB name
+from dotenv import load_dotenv
+from pymongo import DeleteMany, InsertOne, MongoClient, ReplaceOne
+
+from property_parser import SALE_DEED, parse_deed
+from processing_state import bump_data_version, get_watermark, set_watermark
+from rollups import rebuild_daily_rollups
+from snapshots import write_snapshots
+
+# Same configuration as the API (hello_world.py), so snapshots and data versions
+# written here are the ones it serves
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("MONGO_DB_NAME", "mydatabase")
+
+client = MongoClient(MONGO_URI)
+db = client[DB_NAME]
 
 src_collection = db["market-value"]
 dst_collection = db["market-value-processed"]
 
-# Clear the target collection before inserting new documents to avoid duplicates
-dst_collection.delete_many({})
+# Dead letters: one document per raw deed that could not be fully parsed, with reason codes.
+# The deed itself is still written to market-value-processed with whatever was parsed.
+REJECTED_COLLECTION = "market-value-rejected"
+rejected_collection = db[REJECTED_COLLECTION]
 
-# Regex to extract text before W-B:
-W_B_SPLIT_REGEX = re.compile(r"(.*?)\s*W-B:")
+# Full rebuilds are written here and swapped in with renameCollection once complete
+SHADOW_COLLECTION = "market-value-processed__shadow"
+REJECTED_SHADOW_COLLECTION = "market-value-rejected__shadow"
 
-# Extract extent value (number part)
-EXTENT_VALUE_REGEX = re.compile(r"EXTENT:\s*([\d\.]+)")
-# Extract extent unit (letters, dots etc. after value)
-EXTENT_UNIT_REGEX = re.compile(r"EXTENT:\s*[\d\.]+\s*([A-Za-z\.]+)")
-# Extract deedType from natureAndValue (text between first 4-digit code and 'Mkt.Value')
-DEED_TYPE_REGEX = re.compile(r"\d{4}\s+(.+?)\s+Mkt\.Value")
+# Incremental runs pick up raw deeds whose updatedAt (stamped by deed_store on
+# every insert and re-scrape) is after the watermark. Scrapers run on several
+# machines whose clocks and writes are not strictly ordered, so a small window
+# behind the watermark is re-read. Upserts on the natural key make re-reading harmless.
+WATERMARK_OVERLAP_MS = 10 * 60 * 1000
 
-for doc in src_collection.find({}):
-    prop_desc = doc.get("propertyDescription", "").strip()
-    nature_and_value = doc.get("natureAndValue", "").strip()
+# Natural key of a deed, unique in both market-value and market-value-processed
+NATURAL_KEY = ["state", "sroCode", "regYear", "docno"]
 
-    village = None
+# Number of processed documents sent to Mongo per bulk_write round trip
+DEFAULT_BATCH_SIZE = 1000
 
-    # Extract substring before 'W-B:'
-    w_b_match = W_B_SPLIT_REGEX.search(prop_desc)
-    if w_b_match:
-        pre_wb_text = w_b_match.group(1).strip()
+REGISTRATION_DATE_REGEX = re.compile(r"\d{2}-\d{2}-\d{4}")
 
-        # Remove any leading 'VILL/COL:' if present 
-        if pre_wb_text.startswith("VILL/COL:"):
-            pre_wb_text = pre_wb_text[len("VILL/COL:"):].strip()
 
-        # Check for '/'
-        if '/' in pre_wb_text:
-            before_slash, after_slash = pre_wb_text.split('/', 1)
-            before_slash = before_slash.strip()
-            after_slash = after_slash.strip()
-            # Use before slash if non-empty, else after slash
-            village = before_slash if before_slash else after_slash
-        else:
-            village = pre_wb_text
-    else:
-        # If no 'W-B:' present, fallback to full propertyDescription trimmed
-        village = prop_desc
+def to_number(value):
+    """
+    Amounts are ints from the scrapers but older deeds stored them as strings ("1,20,000").
+    """
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return 0
 
-    # Extract Extent value and unit separately
-    extent_value_match = EXTENT_VALUE_REGEX.search(prop_desc)
-    extent_value = extent_value_match.group(1) if extent_value_match else None
 
-    extent_unit_match = EXTENT_UNIT_REGEX.search(prop_desc)
-    extent_unit = extent_unit_match.group(1) if extent_unit_match else None
+def transform(doc):
+    """
+    Build the market-value-processed document for a raw deed (all deed types are kept).
+    """
+    prop_desc = doc.get("propertyDescription", "").strip()
+    nature_and_value = doc.get("natureAndValue", "").strip()
 
-    # Extract deedType from natureAndValue
-    deed_type_match = DEED_TYPE_REGEX.search(nature_and_value)
-    deed_type = deed_type_match.group(1).strip() if deed_type_match else None
+    parsed = parse_deed(prop_desc, nature_and_value)
+    consideration_val = to_number(doc.get("considerationVal"))
 
-    # Keep only Sale Deed transactions
-    if not deed_type or deed_type.lower() != "sale deed":
-        continue
+    # Price per square yard, 0 when the extent could not be normalized (same convention the endpoints used)
+    extent_sq_yds = parsed["extentSqYds"]
+    price_per_sq_yd = consideration_val / extent_sq_yds if extent_sq_yds else 0
 
     # Build new document with required fields and new columns
-    new_doc = {
+    return {
+        "sourceId": doc["_id"],
         "state": doc.get("state"),
         "districtCode": doc.get("districtCode"),
         "sroCode": doc.get("sroCode"),
         "sroName": doc.get("sroName"),
         "docno": doc.get("docno"),
+        "regYear": doc.get("regYear"),
         "dateOfRegistration": doc.get("dateOfRegistration"),
-        "marketValue": doc.get("marketValue"),
-        "considerationVal": doc.get("considerationVal"),
-        "extent": extent_value,
-        "extentUnit": extent_unit,
-        "village": village,
+        "marketValue": to_number(doc.get("marketValue")),
+        "considerationVal": consideration_val,
         "natureAndValue": nature_and_value,
-        "deedType": deed_type,
+        **parsed,
+        "pricePerSqYd": price_per_sq_yd,
+    }
+
+
+def rejection_reasons(new_doc):
+    """
+    Reason codes for the fields of a processed deed that could not be parsed (empty if none).
+    """
+    reasons = []
+    if new_doc["deedType"] is None:
+        reasons.append("deed_type_unparsed")
+    if new_doc["extent"] is None:
+        reasons.append("extent_missing")
+    elif new_doc["extentSqYds"] is None:
+        try:
+            float(new_doc["extent"])
+            reasons.append("extent_unit_unknown")
+        except ValueError:
+            reasons.append("extent_not_numeric")
+    if not REGISTRATION_DATE_REGEX.fullmatch(new_doc["dateOfRegistration"] or ""):
+        reasons.append("registration_date_invalid")
+    if new_doc["deedType"] == SALE_DEED and not new_doc["considerationVal"]:
+        reasons.append("consideration_missing")
+    return reasons
+
+
+def dead_letter(doc, new_doc, reasons):
+    """
+    market-value-rejected document for a raw deed: the raw inputs, what was parsed and why it was rejected.
+    """
+    return {
+        "sourceId": doc["_id"],
+        "sroCode": new_doc["sroCode"],
+        "sroName": new_doc["sroName"],
+        "docno": new_doc["docno"],
+        "regYear": new_doc["regYear"],
+        "reasons": reasons,
+        "propertyDescription": doc.get("propertyDescription"),
+        "natureAndValue": doc.get("natureAndValue"),
+        "dateOfRegistration": doc.get("dateOfRegistration"),
+        "parsed": {field: new_doc[field] for field in ["deedType", "extent", "extentUnit", "extentSqYds", "village"]},
+        "rejectedAt": int(time.time() * 1000),
     }
 
-    dst_collection.insert_one(new_doc)
 
-print("Updated data processing and insertion complete.")
+def ensure_rejected_indexes(collection):
+    collection.create_index("sourceId", unique=True)
+    collection.create_index([("sroCode", 1), ("reasons", 1)])
+
+
+def rejection_summary(rejected=None):
+    """
+    Dead letters per (sroCode, reason), most frequent first.
+    """
+    rejected = rejected if rejected is not None else rejected_collection
+    return list(rejected.aggregate([
+        {"$unwind": "$reasons"},
+        {"$group": {"_id": {"sroCode": "$sroCode", "reason": "$reasons"}, "sroName": {"$first": "$sroName"}, "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$project": {"_id": 0, "sroCode": "$_id.sroCode", "sroName": 1, "reason": "$_id.reason", "count": 1}}
+    ]))
+
+
+def print_rejection_summary(limit=20):
+    summary = rejection_summary()
+    if not summary:
+        print("No rejected deeds.")
+        return
+    totals = Counter()
+    for row in summary:
+        totals[row["reason"]] += row["count"]
+    print("Rejected deeds by reason: " + ", ".join(f"{reason} {count}" for reason, count in totals.most_common()))
+    for row in summary[:limit]:
+        print(f"  {row['sroCode']} {row['sroName']}: {row['reason']} x{row['count']}")
+
+
+def ensure_source_indexes(collection):
+    """
+    Index market-value needs for incremental runs: updatedAt for the watermark query.
+    """
+    collection.create_index("updatedAt")
+
+
+def ensure_indexes(collection):
+    """
+    Indexes market-value-processed needs: the natural key for idempotent upserts,
+    sourceId to trace back to the raw deed, deedType/sroCode/date for the dashboard filters.
+    Documents processed before sourceId existed do not have it, so its unique
+    index only covers documents that do (until the next --full rebuild).
+    """
+    collection.create_index([(field, 1) for field in NATURAL_KEY], unique=True, name="natural_key")
+    collection.create_index("sourceId", unique=True, partialFilterExpression={"sourceId": {"$exists": True}})
+    collection.create_index([("deedType", 1), ("sroCode", 1), ("dateOfRegistration", 1)])
+
+
+def flush(dst, operations):
+    """
+    Send buffered writes in one unordered bulk_write round trip.
+    Returns the number of documents inserted, upserted, modified or deleted.
+    """
+    if not operations:
+        return 0
+    result = dst.bulk_write(operations, ordered=False)
+    return result.inserted_count + result.upserted_count + result.modified_count + result.deleted_count
+
+
+def write_batch(raw_docs, dst, rejected, upsert=True):
+    """
+    Transform raw deeds and write them to dst, and their dead letters to rejected,
+    in unordered bulk writes. With upsert=True dead letters of deeds that now parse
+    cleanly are removed. Returns (registration dates touched, number rejected,
+    number of processed documents that changed). Re-read deeds that come out the
+    same change nothing, and their dates do not count as touched.
+    """
+    operations = []
+    dead_letters = []
+    clean_ids = []
+    touched_dates = set()
+
+    for doc in raw_docs:
+        new_doc = transform(doc)
+        if upsert:
+            operations.append(ReplaceOne({field: new_doc[field] for field in NATURAL_KEY}, new_doc, upsert=True))
+        else:
+            operations.append(InsertOne(new_doc))
+        touched_dates.add(new_doc["dateOfRegistration"])
+
+        reasons = rejection_reasons(new_doc)
+        if reasons:
+            dead_letters.append(ReplaceOne({"sourceId": doc["_id"]}, dead_letter(doc, new_doc, reasons), upsert=True))
+        elif upsert:
+            clean_ids.append(doc["_id"])
+
+    rejected_count = len(dead_letters)
+    if clean_ids:
+        dead_letters.append(DeleteMany({"sourceId": {"$in": clean_ids}}))
+
+    changed = flush(dst, operations)
+    flush(rejected, dead_letters)
+    return (touched_dates if changed else set()), rejected_count, changed
+
+
+def process_documents(query, upsert=True, batch_size=DEFAULT_BATCH_SIZE, src=None, dst=None, rejected=None, label="all"):
+    """
+    Transform every raw deed matching query and write it into
+    market-value-processed in batches of batch_size. With upsert=False plain
+    inserts are used (only safe into an empty collection).
+    Returns (latest raw updatedAt seen, registration dates touched, counts).
+    """
+    src = src if src is not None else src_collection
+    dst = dst if dst is not None else dst_collection
+    rejected = rejected if rejected is not None else rejected_collection
+
+    last_updated_at = None
+    touched_dates = set()
+    read_count = 0
+    rejected_count = 0
+    changed_count = 0
+    batch = []
+    started = time.perf_counter()
+
+    for doc in src.find(query).batch_size(batch_size):
+        updated_at = doc.get("updatedAt")
+        if updated_at is not None and (last_updated_at is None or updated_at > last_updated_at):
+            last_updated_at = updated_at
+        read_count += 1
+        batch.append(doc)
+
+        if len(batch) >= batch_size:
+            batch_dates, batch_rejected, batch_changed = write_batch(batch, dst, rejected, upsert)
+            touched_dates |= batch_dates
+            rejected_count += batch_rejected
+            changed_count += batch_changed
+            batch = []
+            elapsed = time.perf_counter() - started
+            print(f"  [{label}] read {read_count}, rejected {rejected_count} ({read_count / elapsed:.0f} docs/sec)")
+
+    if batch:
+        batch_dates, batch_rejected, batch_changed = write_batch(batch, dst, rejected, upsert)
+        touched_dates |= batch_dates
+        rejected_count += batch_rejected
+        changed_count += batch_changed
+
+    elapsed = time.perf_counter() - started
+    rate = read_count / elapsed if elapsed > 0 else 0
+    print(f"  [{label}] processed {read_count} raw deeds in {elapsed:.1f}s ({rate:.0f} docs/sec)")
+
+    counts = {"read": read_count, "kept": read_count, "changed": changed_count, "rejected": rejected_count, "seconds": elapsed}
+    return last_updated_at, touched_dates, counts
+
+
+def plan_shards(query, shard_count, shard_by="id"):
+    """
+    Split the raw deeds matching query into shards, as (label, shard query) pairs.
+    shard_by="id" cuts contiguous _id ranges of roughly equal size with $bucketAuto,
+    shard_by="sro" gives one shard per sroCode.
+    """
+    if shard_by == "sro":
+        return [(str(code), {"$and": [query, {"sroCode": code}]}) for code in src_collection.distinct("sroCode", query)]
+
+    buckets = list(src_collection.aggregate([
+        {"$match": query},
+        {"$bucketAuto": {"groupBy": "$_id", "buckets": shard_count}}
+    ]))
+    shards = []
+    for i, bucket in enumerate(buckets):
+        # $bucketAuto max is the next bucket's min, only the last bucket is inclusive
+        if i == len(buckets) - 1:
+            id_range = {"$gte": bucket["_id"]["min"]}
+        else:
+            id_range = {"$gte": bucket["_id"]["min"], "$lt": bucket["_id"]["max"]}
+        shards.append((f"shard {i + 1}/{len(buckets)}", {"$and": [query, {"_id": id_range}]}))
+    return shards
+
+
+def _process_shard(args):
+    """
+    Pool worker: process one shard with its own Mongo client.
+    """
+    label, query, upsert, batch_size, dst_name, rejected_name = args
+    worker_client = MongoClient(MONGO_URI)
+    try:
+        worker_db = worker_client[DB_NAME]
+        last_updated_at, touched_dates, counts = process_documents(
+            query, upsert, batch_size,
+            src=worker_db["market-value"], dst=worker_db[dst_name], rejected=worker_db[rejected_name], label=label
+        )
+        return label, last_updated_at, touched_dates, counts
+    finally:
+        worker_client.close()
+
+
+def process(query, upsert=True, batch_size=DEFAULT_BATCH_SIZE, workers=1, shard_by="id",
+            dst_name="market-value-processed", rejected_name=REJECTED_COLLECTION):
+    """
+    Process raw deeds matching query into dst_name (dead letters into rejected_name),
+    serially or split into shards over a process pool. Returns the same
+    (latest updatedAt, touched dates, counts) as process_documents.
+    """
+    if workers <= 1:
+        return process_documents(query, upsert, batch_size, dst=db[dst_name], rejected=db[rejected_name])
+
+    # A few shards per worker keeps the pool busy when shards are uneven
+    shards = plan_shards(query, workers * 4, shard_by)
+    print(f"Processing {len(shards)} shards with {workers} workers")
+
+    last_updated_at = None
+    touched_dates = set()
+    counts = {"read": 0, "kept": 0, "changed": 0, "rejected": 0}
+    started = time.perf_counter()
+
+    # spawn: pymongo clients must not be inherited across fork
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        tasks = [(label, shard_query, upsert, batch_size, dst_name, rejected_name) for label, shard_query in shards]
+        for label, shard_updated_at, shard_dates, shard_counts in pool.imap_unordered(_process_shard, tasks):
+            rate = shard_counts["read"] / shard_counts["seconds"] if shard_counts["seconds"] > 0 else 0
+            print(f"✅ {label}: {shard_counts['read']} read, {shard_counts['rejected']} rejected, {rate:.0f} docs/sec")
+            if shard_updated_at is not None and (last_updated_at is None or shard_updated_at > last_updated_at):
+                last_updated_at = shard_updated_at
+            touched_dates |= shard_dates
+            counts["read"] += shard_counts["read"]
+            counts["kept"] += shard_counts["kept"]
+            counts["changed"] += shard_counts["changed"]
+            counts["rejected"] += shard_counts["rejected"]
+
+    elapsed = time.perf_counter() - started
+    counts["seconds"] = elapsed
+    rate = counts["read"] / elapsed if elapsed > 0 else 0
+    print(f"All shards: {counts['read']} raw deeds in {elapsed:.1f}s ({rate:.0f} docs/sec)")
+    return last_updated_at, touched_dates, counts
+
+
+def run_full(batch_size=DEFAULT_BATCH_SIZE, workers=1, shard_by="id"):
+    """
+    Rebuild market-value-processed from the whole market-value collection.
+
+    The rebuild is written into a shadow collection, indexed and validated there,
+    then swapped in atomically, so the API never reads a partially built collection.
+    Dead letters are rebuilt from scratch the same way, next to it.
+    """
+    shadow = db[SHADOW_COLLECTION]
+    shadow.drop()
+    rejected_shadow = db[REJECTED_SHADOW_COLLECTION]
+    rejected_shadow.drop()
+    ensure_rejected_indexes(rejected_shadow)
+
+    last_updated_at, _, counts = process(
+        {}, upsert=False, batch_size=batch_size, workers=workers, shard_by=shard_by,
+        dst_name=SHADOW_COLLECTION, rejected_name=REJECTED_SHADOW_COLLECTION
+    )
+    print(f"Full rebuild: read {counts['read']} raw deeds, kept {counts['kept']}, rejected {counts['rejected']}.")
+
+    ensure_indexes(shadow)
+
+    # Validate before swapping: every kept deed must be there, and never replace data with nothing
+    shadow_count = shadow.count_documents({})
+    live_count = dst_collection.estimated_document_count()
+    if shadow_count != counts["kept"]:
+        raise RuntimeError(f"Shadow collection has {shadow_count} documents, expected {counts['kept']}. Live collection left untouched.")
+    if shadow_count == 0 and live_count > 0:
+        raise RuntimeError(f"Rebuild produced no documents but {live_count} are live. Live collection left untouched.")
+
+    shadow.rename(dst_collection.name, dropTarget=True)
+    rejected_shadow.rename(REJECTED_COLLECTION, dropTarget=True)
+    print(f"Swapped in rebuilt collection ({shadow_count} documents, previously {live_count}).")
+
+    # Raw deeds written before updatedAt existed are covered by this rebuild,
+    # so without any updatedAt the watermark starts at 0
+    set_watermark(db, last_updated_at if last_updated_at is not None else 0)
+
+    # Refresh the per-SRO daily rollups used by the period comparison endpoints
+    rollup_count = rebuild_daily_rollups(db)
+    print(f"Rebuilt {rollup_count} daily rollup documents.")
+    return counts
+
+
+def run_incremental(batch_size=DEFAULT_BATCH_SIZE, workers=1, shard_by="id"):
+    """
+    Process only raw deeds inserted or re-scraped after the stored updatedAt
+    watermark and upsert them. Falls back to a full rebuild if no watermark exists yet.
+    """
+    watermark = get_watermark(db)
+    if watermark is None:
+        print("No watermark found, running a full rebuild first.")
+        return run_full(batch_size, workers, shard_by)
+
+    ensure_source_indexes(src_collection)
+    ensure_indexes(dst_collection)
+    ensure_rejected_indexes(rejected_collection)
+
+    last_updated_at, touched_dates, counts = process(
+        {"updatedAt": {"$gt": watermark - WATERMARK_OVERLAP_MS}}, batch_size=batch_size, workers=workers, shard_by=shard_by
+    )
+    if last_updated_at is not None and last_updated_at > watermark:
+        set_watermark(db, last_updated_at)
+    print(f"Incremental run since {watermark}: read {counts['read']} raw deeds, {counts['changed']} changed, rejected {counts['rejected']}.")
+
+    if touched_dates:
+        rollup_count = rebuild_daily_rollups(db, touched_dates)
+        print(f"Refreshed daily rollups for {len(touched_dates)} dates ({rollup_count} rollup documents).")
+    return counts
+
+
+def run_rejected(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Re-process only the raw deeds that have a dead letter, e.g. after a parser fix.
+    Deeds that now parse cleanly leave market-value-rejected.
+    """
+    ensure_indexes(dst_collection)
+    source_ids = rejected_collection.distinct("sourceId")
+    print(f"Re-processing {len(source_ids)} rejected deeds.")
+
+    touched_dates = set()
+    counts = {"read": 0, "kept": 0, "changed": 0, "rejected": 0}
+    chunk_size = batch_size * 10
+    for start in range(0, len(source_ids), chunk_size):
+        _, chunk_dates, chunk_counts = process_documents(
+            {"_id": {"$in": source_ids[start:start + chunk_size]}}, batch_size=batch_size, label="rejected"
+        )
+        touched_dates |= chunk_dates
+        for key in counts:
+            counts[key] += chunk_counts[key]
+    print(f"Retry of rejected deeds: {counts['read']} re-processed, {counts['rejected']} still rejected.")
+
+    if touched_dates:
+        rollup_count = rebuild_daily_rollups(db, touched_dates)
+        print(f"Refreshed daily rollups for {len(touched_dates)} dates ({rollup_count} rollup documents).")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process market-value into market-value-processed")
+    parser.add_argument("--full", action="store_true", help="rebuild everything instead of processing new deeds only")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per bulk write")
+    parser.add_argument("--workers", type=int, default=1, help="parallel worker processes (1 = serial)")
+    parser.add_argument("--shard-by", choices=["id", "sro"], default="id", help="split work by _id ranges or by sroCode")
+    parser.add_argument("--retry-rejected", action="store_true", help="re-process only deeds in market-value-rejected")
+    parser.add_argument("--rejections", action="store_true", help="print rejected deeds per SRO and reason, then exit")
+    args = parser.parse_args()
+
+    if args.rejections:
+        print_rejection_summary()
+        raise SystemExit(0)
+
+    if args.retry_rejected:
+        counts = run_rejected(args.batch_size)
+    elif args.full:
+        counts = run_full(args.batch_size, args.workers, args.shard_by)
+    else:
+        counts = run_incremental(args.batch_size, args.workers, args.shard_by)
+
+    print("Updated data processing and insertion complete.")
+    if counts["rejected"]:
+        print_rejection_summary()
+
+    if counts["changed"]:
+        # Publish the new data version and precompute the default dashboard responses
+        data_version = bump_data_version(db)
+        manifest = write_snapshots(db)
+        print(f"Wrote {len(manifest['views'])} dashboard snapshots for data version {data_version}.")